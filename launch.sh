@@ -33,6 +33,8 @@ NETWORK_FILE="data/string_network_filtered_hugo-400.tsv"
 DIAMOND_OUTPUT_FILE="results/diamond_results.tsv"
 CONNECTED_SEEDS_FILE="results/connected_seed_genes.tsv"
 DIAMOND_PLOT_FILE="diamond_network.png"
+# Motor de propagación: diamond | rwr | calor
+PROPAGATION_METHOD="diamond"
 
 # =======================================================
 # CONFIGURACIÓN DEL ENTORNO Y EJECUCIÓN
@@ -85,7 +87,8 @@ $PYTHON_EXEC scripts/propagacion_diamond.py \
     --seed-file "$SEED_GENE_FILE" \
     --input "$NETWORK_FILE" \
     --output "$(basename $DIAMOND_OUTPUT_FILE)" \
-    --plot "$DIAMOND_PLOT_FILE"
+    --plot "$DIAMOND_PLOT_FILE" \
+    --metodo "$PROPAGATION_METHOD"
 
 if [ $? -ne 0 ]; then
     echo "ERROR (Paso 2): La propagación DIAMOnD falló. Abortando el flujo."
@@ -94,6 +97,24 @@ fi
 echo "Paso 2 completado. Resultados DIAMOnD: $DIAMOND_OUTPUT_FILE"
 
 
+# -----------------------------------------------------------
+# PASO 2b: SIGNIFICANCIA DEL MÓDULO (significancia_modulo.py)
+# Output: results/significancia_modulo.tsv
+# -----------------------------------------------------------
+echo ""
+echo "--- 2b. EVALUANDO LA CONECTIVIDAD DEL MÓDULO (LCC z-score) ---"
+$PYTHON_EXEC scripts/significancia_modulo.py \
+    --connected-seeds "$CONNECTED_SEEDS_FILE" \
+    --diamond-results "$DIAMOND_OUTPUT_FILE" \
+    --input "$NETWORK_FILE"
+
+if [ $? -ne 0 ]; then
+    echo "ERROR (Paso 2b): El cálculo de la significancia del módulo falló. Abortando el flujo."
+    exit 1
+fi
+echo "Paso 2b completado."
+
+
 # -----------------------------------------------------------
 # PASO 3: ANÁLISIS DE RESULTADOS (analisis.py)
 # Input: Archivos de resultados de DIAMOnD y el archivo de red original
@@ -0,0 +1,208 @@
+import os
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+
+# Configuración base (mismo cálculo de directorios que enriquecimiento_funcional.py)
+try:
+    script_path = os.path.abspath(sys.argv[0])
+except IndexError:
+    script_path = os.path.abspath(__file__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(script_path))
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+
+UMBRAL_SIGNIFICANCIA = 0.05
+DISTANCIA_CORTE = 0.7
+
+# Funciones auxiliares
+
+# Carga varias tablas de enriquecimiento (formato enriquecimiento_*.tsv) en un diccionario
+def cargar_enriquecimientos(rutas):
+    """Devuelve {nombre_lista: DataFrame} a partir de archivos TSV de Enrichr."""
+    enriquecimientos = {}
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No se encontró el archivo: {ruta}")
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        if nombre.startswith("enriquecimiento_"):
+            nombre = nombre[len("enriquecimiento_"):]
+        enriquecimientos[nombre] = pd.read_csv(ruta, sep="\t")
+    print(f"Tablas de enriquecimiento cargadas: {len(enriquecimientos)}")
+    return enriquecimientos
+
+# Matriz dispersa listas × términos con -log10(FDR) de los términos significativos
+def matriz_significancia(enriquecimientos, umbral=UMBRAL_SIGNIFICANCIA, columna="Adjusted P-value"):
+    """Construye la matriz CSR listas×términos; devuelve (matriz, nombres_listas, términos)."""
+    nombres = list(enriquecimientos)
+    tablas = []
+    for i, nombre in enumerate(nombres):
+        df = enriquecimientos[nombre]
+        if df.empty:
+            continue
+        tablas.append(pd.DataFrame({
+            "lista": i,
+            "Term": df["Term"].astype(str),
+            "p": df[columna].astype(float),
+        }))
+
+    if not tablas:
+        return scipy.sparse.csr_matrix((len(nombres), 0)), nombres, []
+
+    largo = pd.concat(tablas, ignore_index=True)
+    largo = largo[largo["p"] < umbral]
+    # Un mismo término puede aparecer en varias librerías: nos quedamos con el más significativo
+    largo = largo.groupby(["lista", "Term"], as_index=False, sort=False)["p"].min()
+
+    codigos, terminos = pd.factorize(largo["Term"], sort=True)
+    valores = -np.log10(np.clip(largo["p"].to_numpy(), 1e-300, None))
+    # Un p-valor de exactamente 1 no puede pasar el umbral, así que todos los valores son > 0
+    M = scipy.sparse.csr_matrix(
+        (valores, (largo["lista"].to_numpy(), codigos)), shape=(len(nombres), len(terminos))
+    )
+    return M, nombres, list(terminos)
+
+# Similitud de Jaccard entre todas las listas (sobre los términos significativos)
+def similitud_jaccard(M):
+    """Jaccard por pares a partir de la matriz binaria: |A∩B| / |A∪B|."""
+    B = (M > 0).astype(np.float64)
+    interseccion = (B @ B.T).toarray()
+    tamaños = np.diag(interseccion)
+    union = tamaños[:, None] + tamaños[None, :] - interseccion
+    J = np.divide(interseccion, union, out=np.zeros_like(interseccion), where=union > 0)
+    np.fill_diagonal(J, 1.0)
+    return J
+
+# Correlación de Pearson entre perfiles de significancia, sin densificar la matriz
+def similitud_correlacion(M):
+    """Correlación de Pearson por pares entre las filas de M (ceros incluidos)."""
+    n_terminos = M.shape[1]
+    if n_terminos == 0:
+        return np.eye(M.shape[0])
+    medias = np.asarray(M.mean(axis=1)).ravel()
+    cov = (M @ M.T).toarray() / n_terminos - np.outer(medias, medias)
+    desv = np.sqrt(np.clip(np.diag(cov), 0, None))
+    denom = np.outer(desv, desv)
+    R = np.divide(cov, denom, out=np.zeros_like(cov), where=denom > 0)
+    np.fill_diagonal(R, 1.0)
+    return R
+
+# Agrupa las listas que comparten términos (clustering jerárquico sobre 1 - similitud)
+def clusters_listas(similitud, distancia_corte=DISTANCIA_CORTE):
+    """Asigna un cluster a cada lista (average linkage, corte por distancia)."""
+    n = similitud.shape[0]
+    if n < 2:
+        return np.ones(n, dtype=int)
+    distancia = np.clip(1.0 - similitud, 0.0, None)
+    np.fill_diagonal(distancia, 0.0)
+    Z = linkage(squareform(distancia, checks=False), method="average")
+    return fcluster(Z, t=distancia_corte, criterion="distance")
+
+# Tabla de términos: en cuántas listas y en qué clusters es significativo cada término
+def tabla_terminos(M, terminos, etiquetas):
+    """Cuenta, para cada término, las listas en las que es significativo (total y por cluster)."""
+    B = (M > 0).astype(np.float64).tocsc()
+    clusters = np.unique(etiquetas)
+    # Matriz indicadora clusters × listas para contar por cluster con un solo producto
+    C = scipy.sparse.csr_matrix(
+        (np.ones(len(etiquetas)), (np.searchsorted(clusters, etiquetas), np.arange(len(etiquetas)))),
+        shape=(len(clusters), len(etiquetas))
+    )
+    por_cluster = (C @ B).toarray().astype(int)
+
+    df = pd.DataFrame({
+        "Term": terminos,
+        "N_listas": np.asarray(B.sum(axis=0)).ravel().astype(int),
+        "Max_-log10(FDR)": M.max(axis=0).toarray().ravel() if M.shape[1] else [],
+    })
+    for c, fila in zip(clusters, por_cluster):
+        df[f"Cluster_{c}"] = fila
+    return df.sort_values(["N_listas", "Max_-log10(FDR)"], ascending=False)
+
+def comparar_listas(enriquecimientos, metrica="jaccard", umbral=UMBRAL_SIGNIFICANCIA,
+                    distancia_corte=DISTANCIA_CORTE, outdir=RESULTS_DIR, prefijo="comparacion"):
+    """Compara N tablas de enriquecimiento y guarda la matriz, la similitud, los clusters y los términos."""
+    M, nombres, terminos = matriz_significancia(enriquecimientos, umbral=umbral)
+    print(f"Matriz de significancia: {M.shape[0]} listas × {M.shape[1]} términos ({M.nnz} entradas)")
+
+    if metrica == "jaccard":
+        similitud = similitud_jaccard(M)
+    elif metrica == "correlacion":
+        similitud = similitud_correlacion(M)
+    else:
+        raise ValueError(f"Métrica no reconocida: {metrica}")
+
+    etiquetas = clusters_listas(similitud, distancia_corte)
+    df_similitud = pd.DataFrame(similitud, index=nombres, columns=nombres)
+    df_clusters = pd.DataFrame({
+        "Lista": nombres,
+        "Cluster": etiquetas,
+        "N_terminos": np.diff(M.indptr),
+    }).sort_values(["Cluster", "Lista"])
+    df_terminos = tabla_terminos(M, terminos, etiquetas)
+
+    # Guardar resultados
+    os.makedirs(outdir, exist_ok=True)
+    scipy.sparse.save_npz(os.path.join(outdir, f"{prefijo}_matriz.npz"), M)
+    pd.DataFrame({"Term": terminos}).to_csv(os.path.join(outdir, f"{prefijo}_matriz_terminos.tsv"), sep="\t", index=False)
+    df_similitud.to_csv(os.path.join(outdir, f"{prefijo}_similitud_{metrica}.tsv"), sep="\t")
+    df_clusters.to_csv(os.path.join(outdir, f"{prefijo}_clusters.tsv"), sep="\t", index=False)
+    df_terminos.to_csv(os.path.join(outdir, f"{prefijo}_terminos.tsv"), sep="\t", index=False)
+    print(f"Comparación guardada en: {outdir} (prefijo '{prefijo}')")
+
+    return M, df_similitud, df_clusters, df_terminos
+
+# Main
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara los perfiles de enriquecimiento de muchas listas de genes (semillas y candidatos)."
+    )
+    parser.add_argument(
+        '--enrichment-files',
+        required=True,
+        nargs='+',
+        help="Tablas de enriquecimiento (enriquecimiento_*.tsv) a comparar."
+    )
+    parser.add_argument(
+        '--metrica',
+        choices=['jaccard', 'correlacion'],
+        default='jaccard',
+        help="Similitud entre listas (default: jaccard)."
+    )
+    parser.add_argument(
+        '--umbral',
+        type=float,
+        default=UMBRAL_SIGNIFICANCIA,
+        help=f"FDR máximo para considerar un término significativo (default: {UMBRAL_SIGNIFICANCIA})."
+    )
+    parser.add_argument(
+        '--distancia-corte',
+        type=float,
+        default=DISTANCIA_CORTE,
+        help=f"Distancia (1 - similitud) de corte para los clusters de listas (default: {DISTANCIA_CORTE})."
+    )
+    parser.add_argument(
+        '--prefijo',
+        default="comparacion",
+        help="Prefijo de los archivos de salida en la carpeta 'results/'."
+    )
+    args = parser.parse_args()
+
+    try:
+        enriquecimientos = cargar_enriquecimientos(args.enrichment_files)
+    except FileNotFoundError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    comparar_listas(
+        enriquecimientos, metrica=args.metrica, umbral=args.umbral,
+        distancia_corte=args.distancia_corte, prefijo=args.prefijo
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# ----------------------------------------------------------------------
+#    ARNÉS DE EQUIVALENCIA: MOTORES DE PROPAGACIÓN VS DIAMOnD DE REFERENCIA
+# ----------------------------------------------------------------------
+import os
+import argparse
+import sys
+import io
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from propagacion_diamond import (
+    UMBRAL_SCORE, importar_genes, cargar_red_conocida, construir_red,
+    compute_all_gamma_ln, pvalue, diamond_iteration_of_first_X_nodes, diamond_por_firmas,
+    diamond_multicluster, diamond_csr,
+)
+from tabla_hipergeometrica import TablaHipergeometrica
+
+# Configuración base (Se mantiene el cálculo de directorios)
+try:
+    script_path = os.path.abspath(sys.argv[0])
+except IndexError:
+    script_path = os.path.abspath(__file__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(script_path))
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+
+# --- Parámetros Globales ---
+TOLERANCIA_REL = 1e-9
+TOLERANCIA_ABS = 1e-300
+SEMILLA_ALEATORIA = 42
+
+# Motores candidatos: nombre -> función (G, semillas, X) -> lista ordenada de genes añadidos
+MOTORES = {
+    'firmas': diamond_por_firmas,
+    'firmas_tabla': lambda G, semillas, X: diamond_por_firmas(G, semillas, X, tabla=TablaHipergeometrica(len(G.nodes))),
+    'multicluster': lambda G, semillas, X: diamond_multicluster(G, [semillas], X)[0],
+    'csr': diamond_csr,
+}
+
+
+# ----------------------------------------------------------------------
+#                                                 CORPUS DE CASOS
+# ----------------------------------------------------------------------
+def _etiquetar(G):
+    return nx.relabel_nodes(G, {n: f"G{n}" for n in G.nodes})
+
+
+def casos_sinteticos(semilla=SEMILLA_ALEATORIA):
+    """Redes sintéticas pequeñas (libres de escala, aleatoria y con módulo plantado) con sus semillas."""
+    rng = np.random.default_rng(semilla)
+    casos = []
+
+    G = _etiquetar(nx.barabasi_albert_graph(600, 3, seed=semilla))
+    casos.append(('sintetico_barabasi', G, list(rng.choice(sorted(G.nodes), 25, replace=False)), 40))
+
+    G = _etiquetar(nx.gnm_random_graph(500, 2000, seed=semilla))
+    casos.append(('sintetico_erdos_renyi', G, list(rng.choice(sorted(G.nodes), 20, replace=False)), 40))
+
+    # Módulo denso de 40 nodos dentro de una red dispersa; semillas = mitad del módulo
+    G = _etiquetar(nx.planted_partition_graph(10, 40, 0.3, 0.01, seed=semilla))
+    modulo = [f"G{i}" for i in range(40)]
+    casos.append(('sintetico_modulo_plantado', G, list(rng.choice(modulo, 20, replace=False)), 30))
+    return casos
+
+
+def casos_reales(results_dir=RESULTS_DIR, network_file=None, seed_file=None, X=60):
+    """Casos reales: la subred publicada en results/ y, opcionalmente, la red completa."""
+    casos = []
+    subred = os.path.join(results_dir, "subred_autofagia.graphml")
+    semillas_path = os.path.join(results_dir, "connected_seed_genes.tsv")
+    if os.path.exists(subred) and os.path.exists(semillas_path):
+        G = nx.Graph(nx.read_graphml(subred))
+        semillas = pd.read_csv(semillas_path, sep="\t")["HUGO_Symbol"].astype(str).tolist()
+        semillas = [g for g in semillas if g in G]
+        casos.append(('real_subred_autofagia', G, semillas, X))
+    else:
+        print(f"Aviso: no se encontró {subred} o {semillas_path}; se omite el caso real de results/.")
+
+    if network_file and seed_file:
+        with contextlib.redirect_stdout(io.StringIO()):
+            interacciones = cargar_red_conocida(network_file, UMBRAL_SCORE)
+            semillas = importar_genes(seed_file)
+            G, semillas_validas = construir_red(interacciones, semillas)
+        casos.append(('real_red_completa', G, semillas_validas, X))
+    return casos
+
+
+# ----------------------------------------------------------------------
+#                                        FUNCIONES DE COMPARACIÓN
+# ----------------------------------------------------------------------
+def pvalores_paso_a_paso(G, semillas, ranking, gamma_ln=None):
+    """
+    Reproduce un ranking sobre la red y devuelve, para cada paso, el p-valor
+    del nodo elegido y el p-valor mínimo posible según el scorer de referencia.
+    """
+    N = len(G.nodes)
+    gamma_ln = gamma_ln or compute_all_gamma_ln(N)
+    cluster = set(semillas)
+    elegidos, minimos = [], []
+    for nodo in ranking:
+        s = len(cluster)
+        candidatos = {v for u in cluster for v in G.adj[u]} - cluster
+        p_min = min(
+            pvalue(sum(1 for w in G.adj[v] if w in cluster), G.degree(v), N, s, gamma_ln)
+            for v in candidatos
+        )
+        kb = sum(1 for w in G.adj[nodo] if w in cluster)
+        elegidos.append(pvalue(kb, G.degree(nodo), N, s, gamma_ln))
+        minimos.append(p_min)
+        cluster.add(nodo)
+    return np.array(elegidos), np.array(minimos)
+
+
+def _cerca(a, b, rtol=TOLERANCIA_REL, atol=TOLERANCIA_ABS):
+    return np.abs(a - b) <= atol + rtol * np.abs(b)
+
+
+def comparar_rankings(G, semillas, referencia, candidato, gamma_ln=None, rtol=TOLERANCIA_REL):
+    """
+    Diferencias entre el ranking de referencia y el del motor. Como los empates
+    en p-valor se resuelven de forma distinta, la equivalencia se comprueba paso
+    a paso: cada nodo elegido por el motor debe tener el p-valor mínimo
+    (dentro de la tolerancia) dado el cluster que el propio motor ha construido.
+    Max_dif_rel_p es la mayor diferencia relativa entre ambos p-valores.
+    """
+    p_cand, p_min = pvalores_paso_a_paso(G, semillas, candidato, gamma_ln)
+
+    prefijo = next((i for i, (a, b) in enumerate(zip(referencia, candidato)) if a != b), min(len(referencia), len(candidato)))
+    dif_rel = np.abs(p_cand - p_min) / np.maximum(np.abs(p_min), TOLERANCIA_ABS)
+    optimos = _cerca(p_cand, p_min, rtol)
+    conj_ref, conj_cand = set(referencia), set(candidato)
+    union = conj_ref | conj_cand
+
+    return {
+        'Longitud_ref': len(referencia),
+        'Longitud_motor': len(candidato),
+        'Prefijo_identico': prefijo,
+        'Solapamiento': len(conj_ref & conj_cand),
+        'Jaccard': len(conj_ref & conj_cand) / len(union) if union else 1.0,
+        'Max_dif_rel_p': float(dif_rel.max()) if len(dif_rel) else 0.0,
+        'Pasos_optimos': int(optimos.sum()),
+        'Equivalente': bool(len(referencia) == len(candidato) and optimos.all()),
+    }
+
+
+def ejecutar_silencioso(funcion, *args, **kwargs):
+    """Ejecuta un motor sin sus mensajes ni barras de progreso y devuelve (resultado, segundos)."""
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def ejecutar_arnes(casos, motores=None, rtol=TOLERANCIA_REL):
+    """Ejecuta la referencia y cada motor sobre cada caso y devuelve la tabla de resultados."""
+    motores = motores or MOTORES
+    filas = []
+    for nombre, G, semillas, X in casos:
+        X = min(X, len(G.nodes) - len(semillas))
+        print(f"\nCaso {nombre}: {G.number_of_nodes()} nodos, {G.number_of_edges()} enlaces, "
+              f"{len(semillas)} semillas, X = {X}")
+        referencia, t_ref = ejecutar_silencioso(diamond_iteration_of_first_X_nodes, G, semillas, X)
+        gamma_ln = compute_all_gamma_ln(len(G.nodes))
+
+        for nombre_motor, motor in motores.items():
+            candidato, t_motor = ejecutar_silencioso(motor, G, semillas, X)
+            fila = {'Caso': nombre, 'Motor': nombre_motor, 'Nodos': G.number_of_nodes(),
+                    'Semillas': len(semillas), 'X': X}
+            fila.update(comparar_rankings(G, semillas, referencia, candidato, gamma_ln, rtol))
+            fila.update({
+                'T_referencia_s': t_ref,
+                'T_motor_s': t_motor,
+                'Aceleracion': t_ref / t_motor if t_motor > 0 else float('inf'),
+            })
+            estado = "OK" if fila['Equivalente'] else "DIFERENTE"
+            print(f"   [{estado}] {nombre_motor}: prefijo idéntico {fila['Prefijo_identico']}/{X}, "
+                  f"pasos óptimos {fila['Pasos_optimos']}/{len(candidato)}, Jaccard {fila['Jaccard']:.3f}, "
+                  f"aceleración x{fila['Aceleracion']:.1f}")
+            filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def medir_multicluster(casos, n_conjuntos, semilla=SEMILLA_ALEATORIA, rtol=TOLERANCIA_REL):
+    """
+    Rendimiento de DIAMOnD multi-cluster frente a ejecutar los conjuntos uno a
+    uno con `diamond_por_firmas`. Por caso se sortean `n_conjuntos` conjuntos
+    del mismo tamaño que sus semillas; cada ranking multi-cluster se valida
+    paso a paso con el scorer de referencia.
+    """
+    rng = np.random.default_rng(semilla)
+    filas = []
+    for nombre, G, semillas, X in casos:
+        X = min(X, len(G.nodes) - len(semillas))
+        nodos = sorted(G.nodes)
+        conjuntos = [list(rng.choice(nodos, len(semillas), replace=False)) for _ in range(n_conjuntos)]
+        print(f"\nRendimiento multi-cluster en {nombre}: {n_conjuntos} conjuntos de {len(semillas)} semillas, X = {X}")
+
+        secuencial, t_sec = ejecutar_silencioso(lambda: [diamond_por_firmas(G, c, X) for c in conjuntos])
+        multi, t_multi = ejecutar_silencioso(diamond_multicluster, G, conjuntos, X)
+
+        gamma_ln = compute_all_gamma_ln(len(G.nodes))
+        comparaciones = [comparar_rankings(G, c, a, b, gamma_ln, rtol) for c, a, b in zip(conjuntos, secuencial, multi)]
+        fila = {
+            'Caso': nombre, 'Conjuntos': n_conjuntos, 'X': X,
+            'T_secuencial_s': t_sec, 'T_multicluster_s': t_multi,
+            'Conjuntos_por_s_secuencial': n_conjuntos / t_sec if t_sec > 0 else float('inf'),
+            'Conjuntos_por_s_multicluster': n_conjuntos / t_multi if t_multi > 0 else float('inf'),
+            'Aceleracion': t_sec / t_multi if t_multi > 0 else float('inf'),
+            'Rankings_identicos': sum(a == b for a, b in zip(secuencial, multi)),
+            'Jaccard_min': min(c['Jaccard'] for c in comparaciones),
+            'Equivalente': all(c['Equivalente'] for c in comparaciones),
+        }
+        estado = "OK" if fila['Equivalente'] else "DIFERENTE"
+        print(f"   [{estado}] secuencial {t_sec:.2f} s, multi-cluster {t_multi:.2f} s (x{fila['Aceleracion']:.1f}), "
+              f"rankings idénticos {fila['Rankings_identicos']}/{n_conjuntos}")
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def con_pesos(G, semilla=SEMILLA_ALEATORIA):
+    """
+    Copia de G con pesos en [0, 1] como los de `construir_red`: reescala los
+    combined_score en bruto (> 1) y sortea pesos en [0.7, 1] si no hay.
+    """
+    G = G.copy()
+    pesos = [d.get('weight') for _, _, d in G.edges(data=True)]
+    if any(p is None for p in pesos):
+        rng = np.random.default_rng(semilla)
+        for _, _, d in G.edges(data=True):
+            d['weight'] = float(rng.uniform(0.7, 1.0))
+    elif max(pesos, default=0) > 1:
+        for _, _, d in G.edges(data=True):
+            d['weight'] = d['weight'] / 1000.0
+    return G
+
+
+def medir_ponderado(casos):
+    """
+    Coste de DIAMOnD ponderado frente al no ponderado (mismo motor CSR) y a
+    `diamond_por_firmas`. Comprueba también que con todos los pesos a 1 el
+    camino ponderado reproduce el ranking no ponderado.
+    """
+    filas = []
+    for nombre, G, semillas, X in casos:
+        X = min(X, len(G.nodes) - len(semillas))
+        G = con_pesos(G)
+        G_unitario = G.copy()
+        nx.set_edge_attributes(G_unitario, 1.0, 'weight')
+
+        firmas, t_firmas = ejecutar_silencioso(diamond_por_firmas, G, semillas, X)
+        no_ponderado, t_csr = ejecutar_silencioso(diamond_csr, G, semillas, X)
+        ponderado, t_ponderado = ejecutar_silencioso(diamond_csr, G, semillas, X, ponderado=True)
+        unitario, _ = ejecutar_silencioso(diamond_csr, G_unitario, semillas, X, ponderado=True)
+
+        union = set(ponderado) | set(no_ponderado)
+        fila = {
+            'Caso': nombre, 'Semillas': len(semillas), 'X': X,
+            'T_firmas_s': t_firmas, 'T_csr_s': t_csr, 'T_csr_ponderado_s': t_ponderado,
+            'Coste_relativo_ponderado': t_ponderado / t_csr if t_csr > 0 else float('inf'),
+            'Jaccard_ponderado_vs_no_ponderado': len(set(ponderado) & set(no_ponderado)) / len(union) if union else 1.0,
+            'Pesos_1_identico': unitario == no_ponderado,
+        }
+        print(f"\nDIAMOnD ponderado en {nombre}: firmas {t_firmas:.2f} s, CSR {t_csr:.2f} s, "
+              f"CSR ponderado {t_ponderado:.2f} s (x{fila['Coste_relativo_ponderado']:.2f}), "
+              f"Jaccard con el no ponderado {fila['Jaccard_ponderado_vs_no_ponderado']:.3f}, "
+              f"pesos 1 idéntico: {'sí' if fila['Pesos_1_identico'] else 'NO'}")
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+# ----------------------------------------------------------------------
+#                                                         MAIN CLI
+# ----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara los motores de propagación rápidos con la implementación de referencia de DIAMOnD."
+    )
+    parser.add_argument(
+        '--motores',
+        nargs='+',
+        choices=sorted(MOTORES),
+        default=sorted(MOTORES),
+        help="Motores a comparar con la referencia (default: todos)."
+    )
+    parser.add_argument(
+        '--input',
+        default=None,
+        help="Red completa (HUGO/TSV) para añadir un caso real adicional (requiere --seed-file)."
+    )
+    parser.add_argument(
+        '--seed-file',
+        default=None,
+        help="Genes semilla para el caso de la red completa."
+    )
+    parser.add_argument(
+        '--sin-sinteticos',
+        action='store_true',
+        help="Omite los casos sintéticos."
+    )
+    parser.add_argument(
+        '--rtol',
+        type=float,
+        default=TOLERANCIA_REL,
+        help=f"Tolerancia relativa para comparar p-valores (default: {TOLERANCIA_REL})."
+    )
+    parser.add_argument(
+        '--output',
+        default='equivalencia_motores.tsv',
+        help="Nombre del archivo de resultados en la carpeta 'results/'."
+    )
+    parser.add_argument(
+        '--conjuntos-multicluster',
+        type=int,
+        default=0,
+        help="Si es > 0, mide el rendimiento multi-cluster con ese número de conjuntos aleatorios por caso "
+             "(results/rendimiento_multicluster.tsv)."
+    )
+    parser.add_argument(
+        '--ponderado',
+        action='store_true',
+        help="Mide el coste de DIAMOnD ponderado frente al no ponderado (results/rendimiento_ponderado.tsv)."
+    )
+    args = parser.parse_args()
+
+    casos = [] if args.sin_sinteticos else casos_sinteticos()
+    casos += casos_reales(network_file=args.input, seed_file=args.seed_file)
+    if not casos:
+        print("No hay casos que comparar.")
+        sys.exit(1)
+
+    tabla = ejecutar_arnes(casos, {m: MOTORES[m] for m in args.motores}, args.rtol)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_path = os.path.join(RESULTS_DIR, args.output)
+    tabla.to_csv(output_path, sep="\t", index=False)
+    print(f"\nResultados de equivalencia guardados en: {output_path}")
+
+    if args.conjuntos_multicluster > 0:
+        rendimiento = medir_multicluster(casos, args.conjuntos_multicluster, rtol=args.rtol)
+        rendimiento_path = os.path.join(RESULTS_DIR, "rendimiento_multicluster.tsv")
+        rendimiento.to_csv(rendimiento_path, sep="\t", index=False)
+        print(f"\nRendimiento multi-cluster guardado en: {rendimiento_path}")
+        tabla = pd.concat([tabla, rendimiento[['Equivalente']]], ignore_index=True)
+
+    if args.ponderado:
+        ponderado = medir_ponderado(casos)
+        ponderado_path = os.path.join(RESULTS_DIR, "rendimiento_ponderado.tsv")
+        ponderado.to_csv(ponderado_path, sep="\t", index=False)
+        print(f"\nRendimiento ponderado guardado en: {ponderado_path}")
+        tabla = pd.concat([tabla, ponderado[['Pesos_1_identico']].rename(columns={'Pesos_1_identico': 'Equivalente'})],
+                          ignore_index=True)
+
+    if not tabla['Equivalente'].all():
+        print("ATENCIÓN: algún motor no es equivalente a la referencia.")
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,6 @@ import argparse
 import sys
 import pandas as pd
 from tqdm import tqdm
-import re
 
 # --- Parámetros Globales de STRING DB ---
 # ID de taxón para humano
@@ -20,6 +19,9 @@ STRING_LINKS_URL = f"https://stringdb-downloads.org/download/protein.links.{STRI
 STRING_ALIAS_URL = f"https://stringdb-downloads.org/download/protein.aliases.{STRING_VERSION}/"
 # Umbral de score combinado por defecto para el FILTRADO
 SCORE_THRESHOLD = 700 
+# Política para combinar el score de las interacciones duplicadas tras el mapeo a HUGO
+SCORE_AGGREGATION = "max"
+AGGREGATION_POLICIES = ["max", "mean", "min"]
 
 def download_and_process_aliases(organism: int) -> pd.Series:
     """
@@ -58,9 +60,48 @@ def download_and_process_aliases(organism: int) -> pd.Series:
     return hugo_map
 
 
-def download_and_filter_string_network(organism: int, score_threshold: int, output_file: str, hugo_map: pd.Series):
+def canonicalize_undirected_edges(interactions_df: pd.DataFrame, aggregation: str = SCORE_AGGREGATION):
     """
-    Descarga las interacciones PPI, las filtra y mapea los IDs de STRING a HUGO.
+    Convierte las interacciones en aristas no dirigidas canónicas (protein1 <= protein2),
+    elimina los self-loops y colapsa los duplicados combinando su score con `aggregation`.
+    Devuelve el DataFrame resultante y un diccionario con los recuentos.
+    """
+    if aggregation not in AGGREGATION_POLICIES:
+        raise ValueError(f"Política de agregación no válida: {aggregation} (usa {', '.join(AGGREGATION_POLICIES)})")
+
+    p1 = interactions_df['protein1'].astype(str)
+    p2 = interactions_df['protein2'].astype(str)
+    swap = p1 > p2
+    canonical = pd.DataFrame({
+        'protein1': p1.where(~swap, p2),
+        'protein2': p2.where(~swap, p1),
+        'combined_score': interactions_df['combined_score'],
+    })
+
+    self_loops = canonical['protein1'] == canonical['protein2']
+    canonical = canonical[~self_loops]
+
+    deduplicated = (
+        canonical.groupby(['protein1', 'protein2'], as_index=False, sort=True)['combined_score']
+        .agg(aggregation)
+    )
+    if aggregation != "mean":
+        deduplicated['combined_score'] = deduplicated['combined_score'].astype(interactions_df['combined_score'].dtype)
+
+    counts = {
+        'input': len(interactions_df),
+        'self_loops': int(self_loops.sum()),
+        'duplicates': len(canonical) - len(deduplicated),
+        'output': len(deduplicated),
+    }
+    return deduplicated, counts
+
+
+def download_and_filter_string_network(organism: int, score_threshold: int, output_file: str, hugo_map: pd.Series,
+                                       aggregation: str = SCORE_AGGREGATION):
+    """
+    Descarga las interacciones PPI, las filtra, mapea los IDs de STRING a HUGO y
+    deja una sola arista no dirigida por pareja de genes.
     """
     links_filename = f"{organism}.protein.links.{STRING_VERSION}.txt.gz"
     download_url = STRING_LINKS_URL + links_filename
@@ -89,7 +130,7 @@ def download_and_filter_string_network(organism: int, score_threshold: int, outp
     interactions_df['combined_score'] = pd.to_numeric(interactions_df['combined_score'], errors='coerce')
     interactions_df = interactions_df.dropna(subset=['combined_score'])
     
-    interactions_df_filtered = interactions_df[interactions_df['combined_score'] >= score_threshold]
+    interactions_df_filtered = interactions_df[interactions_df['combined_score'] >= score_threshold].copy()
     filtered_count_score = len(interactions_df_filtered)
     print(f"   Líneas originales: {original_count}")
     print(f"   Líneas después de filtro de score (>= {score_threshold}): {filtered_count_score}")
@@ -97,8 +138,8 @@ def download_and_filter_string_network(organism: int, score_threshold: int, outp
 
     # 3. Mapear IDs de STRING a HUGO Symbols
     # Los IDs de STRING tienen el prefijo '9606.' que hay que eliminar para el mapeo
-    interactions_df_filtered['protein1'] = interactions_df_filtered['protein1'].apply(lambda x: re.sub(r'^\d+\.', '', str(x)))
-    interactions_df_filtered['protein2'] = interactions_df_filtered['protein2'].apply(lambda x: re.sub(r'^\d+\.', '', str(x)))
+    interactions_df_filtered['protein1'] = interactions_df_filtered['protein1'].astype(str).str.replace(r'^\d+\.', '', regex=True)
+    interactions_df_filtered['protein2'] = interactions_df_filtered['protein2'].astype(str).str.replace(r'^\d+\.', '', regex=True)
 
     # Aplicar el mapeo
     print("Mapeando IDs de STRING a símbolos HUGO...")
@@ -110,7 +151,14 @@ def download_and_filter_string_network(organism: int, score_threshold: int, outp
     interactions_df_filtered = interactions_df_filtered.dropna(subset=['protein1', 'protein2'])
     final_count = len(interactions_df_filtered)
     
-    print(f"   Líneas mapeadas a HUGO (finales): {final_count} (se eliminaron {mapped_count - final_count} interacciones sin mapeo).")
+    print(f"   Líneas mapeadas a HUGO: {final_count} (se eliminaron {mapped_count - final_count} interacciones sin mapeo).")
+
+    # 4b. Aristas no dirigidas canónicas: STRING lista cada interacción en ambos sentidos y
+    # varios IDs de STRING pueden mapear al mismo símbolo (duplicados y self-loops)
+    interactions_df_filtered, counts = canonicalize_undirected_edges(interactions_df_filtered, aggregation)
+    print(f"   Self-loops eliminados: {counts['self_loops']}")
+    print(f"   Duplicados colapsados (score '{aggregation}'): {counts['duplicates']}")
+    print(f"   Aristas no dirigidas únicas (finales): {counts['output']}")
 
     # 5. Guardar el resultado filtrado y mapeado
     try:
@@ -154,6 +202,12 @@ def main():
         required=True, # Ahora es obligatorio
         help="Ruta y nombre del archivo de salida para la red filtrada (ej: data/network.tsv)."
     )
+    parser.add_argument(
+        '--aggregation',
+        choices=AGGREGATION_POLICIES,
+        default=SCORE_AGGREGATION,
+        help=f"Cómo combinar el score de interacciones duplicadas tras el mapeo (default: {SCORE_AGGREGATION})."
+    )
     args = parser.parse_args()
 
     # 1. Obtener el mapa de IDs de STRING a HUGO
@@ -163,7 +217,7 @@ def main():
         sys.exit(1)
 
     # 2. Descargar, filtrar y mapear la red PPI
-    download_and_filter_string_network(args.organism, args.score, args.output_file, hugo_map)
+    download_and_filter_string_network(args.organism, args.score, args.output_file, hugo_map, args.aggregation)
 
 
 if __name__ == '__main__':
@@ -1,12 +1,19 @@
 import os
 import re
+import io
+import json
+import time
+import hashlib
 import numpy as np
 import pandas as pd
-import gseapy as gp
+import requests
 import networkx as nx
 import matplotlib.pyplot as plt
 import argparse 
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from comparar_enriquecimientos import comparar_listas
+from indice_red import obtener_indice, consultar_indice
 
 
 try:
@@ -29,6 +36,12 @@ os.makedirs(RESULTS_DIR, exist_ok=True)
 
 PPI_SCORE_UMBRAL = 700
 
+# Enriquecimiento remoto (Enrichr) y caché en disco de sus respuestas
+ENRICHR_URL = "https://maayanlab.cloud/Enrichr"
+CACHE_DIR = os.path.join(DATA_DIR, "cache_enrichr")
+MAX_PETICIONES = 4
+REINTENTOS = 3
+
 # Funciones auxiliares
 
 # Carga la lista de genes y devuelve los nombres únicos de genes en una lista
@@ -59,23 +72,106 @@ def cargar_genes(file_path, columna=None):
     print(f"Genes cargados ({len(genes)}): {file_path}")
     return genes
 
-# Enriquecimiento funcional con GSEAPY (GOKEGG) para una lista de genes
-def realizar_enriquecimiento(genes, conjunto_nombre, libreria="KEGG_2021_Human", outdir=RESULTS_DIR):
-    """Ejecuta análisis de enriquecimiento con GSEAPY"""
-    enr = gp.enrichr(
-        gene_list=genes,
-        gene_sets=[libreria, "GO_Biological_Process_2021"],
-        organism="Human",
-        outdir=None,  # No guardar automáticamente
-        cutoff=0.05
-    )
+# Normaliza la lista de genes para que el orden o los duplicados no cambien la clave de caché
+def normalizar_lista(genes):
+    """Devuelve la lista de genes única, en mayúsculas y ordenada."""
+    return sorted({str(g).strip().upper() for g in genes if str(g).strip()})
+
+def clave_cache(genes, libreria, url=ENRICHR_URL):
+    """Clave de caché: hash de la URL base de Enrichr, la librería y la lista de genes normalizada."""
+    # La URL entra en la clave para que las respuestas de otro servidor (p. ej. un stub local) no se mezclen
+    contenido = url.strip().rstrip("/") + "\n" + libreria + "\n" + "\n".join(normalizar_lista(genes))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+def leer_cache(genes, libreria, cache_dir=CACHE_DIR, url=ENRICHR_URL):
+    """Devuelve el DataFrame guardado para (genes, librería, URL) o None si no está en caché."""
+    if cache_dir is None:
+        return None
+    path = os.path.join(cache_dir, f"{clave_cache(genes, libreria, url)}.tsv")
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, sep="\t")
+
+def guardar_cache(df, genes, libreria, cache_dir=CACHE_DIR, url=ENRICHR_URL):
+    """Guarda de forma atómica la respuesta de Enrichr en la caché."""
+    if cache_dir is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{clave_cache(genes, libreria, url)}.tsv")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, sep="\t", index=False)
+    os.replace(tmp_path, path)
+
+# Petición HTTP con reintentos y espera exponencial (errores de red, 429 y 5xx)
+def peticion_enrichr(metodo, url, reintentos=REINTENTOS, espera=1.0, **kwargs):
+    """Realiza una petición a Enrichr reintentando ante fallos transitorios."""
+    for intento in range(reintentos + 1):
+        try:
+            response = requests.request(metodo, url, timeout=60, **kwargs)
+            if response.status_code != 429 and response.status_code < 500:
+                response.raise_for_status()
+                return response
+            error = f"código de estado {response.status_code}"
+        except requests.exceptions.ConnectionError as e:
+            error = str(e)
+        except requests.exceptions.Timeout as e:
+            error = str(e)
+        if intento < reintentos:
+            time.sleep(espera * 2 ** intento)
+    raise RuntimeError(f"Enrichr no respondió tras {reintentos + 1} intentos ({url}): {error}")
+
+def consultar_enrichr(genes, librerias, url=ENRICHR_URL, reintentos=REINTENTOS):
+    """Envía la lista a Enrichr y devuelve un DataFrame por librería."""
+    payload = {"list": (None, "\n".join(genes)), "description": (None, "HAB_Proyecto")}
+    respuesta = peticion_enrichr("POST", f"{url}/addList", reintentos=reintentos, files=payload)
+    user_list_id = json.loads(respuesta.text)["userListId"]
+
+    resultados = {}
+    for libreria in librerias:
+        params = {"userListId": user_list_id, "filename": "temp", "backgroundType": libreria}
+        respuesta = peticion_enrichr("GET", f"{url}/export", reintentos=reintentos, params=params)
+        df = pd.read_csv(io.StringIO(respuesta.text), sep="\t")
+        df.insert(0, "Gene_set", libreria)
+        resultados[libreria] = df
+    return resultados
+
+def enriquecer_lista(genes, librerias, url=ENRICHR_URL, cache_dir=CACHE_DIR, reintentos=REINTENTOS):
+    """Resultados de enriquecimiento de una lista, consultando a Enrichr solo las librerías que no están en caché."""
+    resultados = {lib: leer_cache(genes, lib, cache_dir, url=url) for lib in librerias}
+    pendientes = [lib for lib, df in resultados.items() if df is None]
+
+    if pendientes:
+        nuevos = consultar_enrichr(genes, pendientes, url=url, reintentos=reintentos)
+        for lib, df in nuevos.items():
+            guardar_cache(df, genes, lib, cache_dir, url=url)
+            resultados[lib] = df
+
+    return pd.concat([resultados[lib] for lib in librerias], ignore_index=True)
+
+# Enriquecimiento funcional con Enrichr (GO/KEGG) para una lista de genes
+def realizar_enriquecimiento(genes, conjunto_nombre, libreria="KEGG_2021_Human", outdir=RESULTS_DIR,
+                             url=ENRICHR_URL, cache_dir=CACHE_DIR):
+    """Ejecuta análisis de enriquecimiento con Enrichr"""
+    librerias = [libreria, "GO_Biological_Process_2021"]
+    resultados = enriquecer_lista(genes, librerias, url=url, cache_dir=cache_dir)
 
     # Guardar resultados
     resultado_path = os.path.join(outdir, f"enriquecimiento_{conjunto_nombre}.tsv")
-    enr.results.to_csv(resultado_path, sep="\t", index=False)
+    resultados.to_csv(resultado_path, sep="\t", index=False)
     print(f"Resultados guardados en: {resultado_path}")
 
-    return enr.results
+    return resultados
+
+# Lanza varios enriquecimientos en paralelo (con un máximo de peticiones simultáneas)
+def realizar_enriquecimientos(conjuntos, libreria="KEGG_2021_Human", outdir=RESULTS_DIR,
+                              url=ENRICHR_URL, cache_dir=CACHE_DIR, max_peticiones=MAX_PETICIONES):
+    """Ejecuta realizar_enriquecimiento para cada conjunto {nombre: genes} de forma concurrente."""
+    with ThreadPoolExecutor(max_workers=max(1, max_peticiones)) as executor:
+        futuros = {
+            nombre: executor.submit(realizar_enriquecimiento, genes, nombre, libreria, outdir, url, cache_dir)
+            for nombre, genes in conjuntos.items()
+        }
+        return {nombre: futuro.result() for nombre, futuro in futuros.items()}
 
 # Miramos qué terminos se repiten entre dos listas y mostramos los comunes y los únicos
 def comparar_enriquecimientos(df1, df2):
@@ -146,8 +242,9 @@ def construir_grafo(ppi_file, umbral=PPI_SCORE_UMBRAL):
                    weight=row["combined_score"])
     return G
 
-def calcular_propiedades(G, semillas, candidatos):
-    """Calcula grado, centralidades y modularidad en la subred semillas∪candidatos."""
+def calcular_propiedades(G, semillas, candidatos, indice=None):
+    """Calcula grado, centralidades y modularidad en la subred semillas∪candidatos.
+    Si se pasa el índice global de la red, añade también las métricas globales."""
     sub_nodes = (set(semillas) | set(candidatos)) & set(G.nodes())
     subgraph = G.subgraph(sub_nodes).copy()
 
@@ -162,7 +259,10 @@ def calcular_propiedades(G, semillas, candidatos):
         "Centralidad": [deg_cent[n] for n in sub_nodes],
         "Betweenness": [betw[n] for n in sub_nodes],
         "Tipo": ["Semilla" if n in semillas else "Candidato" for n in sub_nodes]
-    }).sort_values(["Grado", "Centralidad"], ascending=False)
+    })
+    if indice is not None:
+        df = pd.concat([df, consultar_indice(indice, df["Gen"])], axis=1)
+    df = df.sort_values(["Grado", "Centralidad"], ascending=False)
 
     modularidad = None
     if HAS_LOUVAIN and subgraph.number_of_edges() > 0:
@@ -206,6 +306,22 @@ def main():
         required=True, 
         help="Ruta al archivo de interacciones PPI original (p. ej., string_network_filtered.tsv)."
     )
+    parser.add_argument(
+        '--enrichr-url',
+        default=ENRICHR_URL,
+        help=f"URL base del servidor Enrichr (default: {ENRICHR_URL})."
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=CACHE_DIR,
+        help="Carpeta de la caché en disco de respuestas de Enrichr."
+    )
+    parser.add_argument(
+        '--max-peticiones',
+        type=int,
+        default=MAX_PETICIONES,
+        help=f"Número máximo de consultas simultáneas a Enrichr (default: {MAX_PETICIONES})."
+    )
     args = parser.parse_args()
     
     genes_semilla_path = args.connected_seeds
@@ -226,9 +342,13 @@ def main():
         print("No hay genes semilla conectados ni genes DIAMOnD. Finalizando análisis.")
         return
 
-    # 2. Enriquecimiento para cada grupo
-    enr_semilla = realizar_enriquecimiento(genes_semilla, "semillas")
-    enr_diamond = realizar_enriquecimiento(genes_diamond, "candidatos")
+    # 2. Enriquecimiento para cada grupo (en paralelo y con caché en disco)
+    enriquecimientos = realizar_enriquecimientos(
+        {"semillas": genes_semilla, "candidatos": genes_diamond},
+        url=args.enrichr_url, cache_dir=args.cache_dir, max_peticiones=args.max_peticiones
+    )
+    enr_semilla = enriquecimientos["semillas"]
+    enr_diamond = enriquecimientos["candidatos"]
 
     # 3. Comparar resultados
     comun, unicos_semilla, unicos_diamond = comparar_enriquecimientos(enr_semilla, enr_diamond)
@@ -247,12 +367,18 @@ def main():
     
     print(f"\nResumen comparativo guardado en: {resumen_path}")
 
+    # Matrices y tablas de comparación (mismo motor que el análisis multi-lista)
+    comparar_listas({"Semillas": enr_semilla, "Candidatos": enr_diamond})
+
     # 6. Análisis estructural
     print("\n--- Construyendo subred PPI ---")
     G = construir_grafo(interacciones_file_path, umbral=PPI_SCORE_UMBRAL)
     print(f"Nodos totales en la red: {G.number_of_nodes()}")
         
-    df_struct, modularidad, subgraph = calcular_propiedades(G, genes_semilla, genes_diamond)
+    # Métricas globales (índice precomputado de toda la red filtrada)
+    indice = obtener_indice(interacciones_file_path, PPI_SCORE_UMBRAL, G=G)
+        
+    df_struct, modularidad, subgraph = calcular_propiedades(G, genes_semilla, genes_diamond, indice=indice)
     
     if df_struct.empty:
         print("No se pudo realizar el análisis estructural (subred vacía).")
@@ -0,0 +1,220 @@
+# ----------------------------------------------------------------------
+#             ÍNDICE DE MÉTRICAS GLOBALES DE LA RED PPI (PRECOMPUTADO)
+# ----------------------------------------------------------------------
+import os
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+try:
+    import community as community_louvain
+    HAS_LOUVAIN = True
+except Exception:
+    community_louvain = None
+    HAS_LOUVAIN = False
+
+# --- Parámetros Globales ---
+UMBRAL_SCORE = 700
+# Número de nodos pivote para la betweenness aproximada (muestreo de Brandes)
+K_BETWEENNESS = 500
+SEMILLA_ALEATORIA = 42
+# Versión del formato del índice: si cambia, los índices antiguos se reconstruyen
+VERSION_INDICE = 2
+
+# Columnas globales que se añaden a las tablas de resultados
+COLUMNAS_GLOBALES = {
+    'grado': 'Grado_global',
+    'core': 'Core_global',
+    'betweenness': 'Betweenness_global',
+    'clustering': 'Clustering_global',
+    'comunidad': 'Comunidad_global',
+}
+
+
+def ruta_indice(network_file, umbral=UMBRAL_SCORE):
+    """Ruta del índice en caché: junto a la red, con el umbral en el nombre."""
+    base = os.path.splitext(network_file)[0]
+    return f"{base}_indice_{umbral}.npz"
+
+
+def firma_red(network_file):
+    """Tamaño y fecha de modificación de la red, para invalidar el índice si cambia."""
+    st = os.stat(network_file)
+    return np.array([st.st_size, int(st.st_mtime_ns)], dtype=np.int64)
+
+
+def grafo_filtrado(network_file, umbral=UMBRAL_SCORE):
+    """Carga la red TSV, filtra por score y devuelve el grafo con símbolos en mayúsculas."""
+    df = pd.read_csv(network_file, sep="\t")
+    df = df.iloc[:, [0, 1, 2]]
+    df.columns = ["protein1_hugo", "protein2_hugo", "combined_score"]
+    df["combined_score"] = pd.to_numeric(df["combined_score"], errors="coerce")
+    df = df[df["combined_score"] >= umbral]
+    df["protein1_hugo"] = df["protein1_hugo"].astype(str).str.upper()
+    df["protein2_hugo"] = df["protein2_hugo"].astype(str).str.upper()
+    return nx.from_pandas_edgelist(df, "protein1_hugo", "protein2_hugo")
+
+
+def calcular_indice(G, k_betweenness=K_BETWEENNESS, semilla=SEMILLA_ALEATORIA):
+    """
+    Calcula las métricas globales de todos los nodos de G y las devuelve como
+    arrays alineados con la lista ordenada de nodos.
+    """
+    G = nx.Graph(G)
+    G.remove_edges_from(nx.selfloop_edges(G))
+    nodos = sorted(str(n).upper() for n in G.nodes)
+    G = nx.relabel_nodes(G, {n: str(n).upper() for n in G.nodes})
+    n_nodos = len(nodos)
+
+    print(f"Calculando índice global para {n_nodos} nodos y {G.number_of_edges()} enlaces...")
+    grado = dict(G.degree())
+    core = nx.core_number(G)
+    clustering = nx.clustering(G)
+
+    k = min(k_betweenness, n_nodos) if k_betweenness else None
+    print(f"   Betweenness aproximada con {k if k else n_nodos} pivotes...")
+    betw = nx.betweenness_centrality(G, k=k, normalized=True, seed=semilla)
+
+    comunidad = {}
+    if HAS_LOUVAIN and G.number_of_edges() > 0:
+        comunidad = community_louvain.best_partition(G, random_state=semilla)
+
+    return {
+        'nodos': np.array(nodos, dtype=str),
+        'grado': np.array([grado[n] for n in nodos], dtype=np.int32),
+        'core': np.array([core[n] for n in nodos], dtype=np.int32),
+        'betweenness': np.array([betw[n] for n in nodos], dtype=np.float32),
+        'clustering': np.array([clustering[n] for n in nodos], dtype=np.float32),
+        'comunidad': np.array([comunidad.get(n, -1) for n in nodos], dtype=np.int32),
+    }
+
+
+def guardar_indice(indice, path, firma=None, umbral=UMBRAL_SCORE, k_betweenness=K_BETWEENNESS):
+    """Guarda el índice en un .npz comprimido (escritura atómica); k_betweenness 0 = exacta."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        version=np.int32(VERSION_INDICE),
+        umbral=np.int32(umbral),
+        k_betweenness=np.int32(k_betweenness or 0),
+        firma=firma if firma is not None else np.zeros(2, dtype=np.int64),
+        **indice
+    )
+    os.replace(tmp_path, path)
+    print(f"Índice global guardado en: {path}")
+
+
+def cargar_indice(path, firma=None, k_betweenness=None):
+    """
+    Carga el índice; devuelve None si no existe, es de otra versión, la red ha
+    cambiado o se calculó con otro número de pivotes para la betweenness.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as datos:
+        if int(datos['version']) != VERSION_INDICE:
+            return None
+        if firma is not None and not np.array_equal(datos['firma'], firma):
+            return None
+        if k_betweenness is not None and int(datos['k_betweenness']) != (k_betweenness or 0):
+            return None
+        return {clave: datos[clave] for clave in ['nodos', *COLUMNAS_GLOBALES]}
+
+
+def obtener_indice(network_file, umbral=UMBRAL_SCORE, G=None, k_betweenness=K_BETWEENNESS, exigir_pivotes=False):
+    """
+    Devuelve el índice global de la red filtrada, leyéndolo de la caché o
+    construyéndolo (una sola vez) si no existe o está desactualizado.
+    k_betweenness solo se usa al construirlo: se acepta cualquier índice válido
+    en caché salvo que exigir_pivotes=True (caso de indice_red.py).
+    """
+    path = ruta_indice(network_file, umbral)
+    firma = firma_red(network_file)
+    indice = cargar_indice(path, firma, k_betweenness=k_betweenness if exigir_pivotes else None)
+    if indice is not None:
+        print(f"Índice global cargado desde: {path} ({len(indice['nodos'])} nodos)")
+        return indice
+
+    if G is None:
+        G = grafo_filtrado(network_file, umbral)
+    indice = calcular_indice(G, k_betweenness=k_betweenness)
+    guardar_indice(indice, path, firma=firma, umbral=umbral, k_betweenness=k_betweenness)
+    return indice
+
+
+def consultar_indice(indice, genes):
+    """
+    Devuelve un DataFrame con las métricas globales de `genes` (en su orden),
+    buscadas por posición en el array ordenado de nodos. Los genes ausentes
+    de la red quedan como NaN.
+    """
+    genes = [str(g).upper() for g in genes]
+    nodos = indice['nodos']
+    consulta = np.array(genes, dtype=str)
+    pos = np.searchsorted(nodos, consulta)
+    pos_segura = np.minimum(pos, max(len(nodos) - 1, 0))
+    presente = (pos < len(nodos)) & (nodos[pos_segura] == consulta) if len(nodos) else np.zeros(len(genes), dtype=bool)
+
+    columnas = {}
+    for clave, nombre in COLUMNAS_GLOBALES.items():
+        valores = np.full(len(genes), np.nan)
+        valores[presente] = indice[clave][pos_segura[presente]]
+        # Las métricas enteras se mantienen enteras (con NA para los ausentes)
+        if np.issubdtype(indice[clave].dtype, np.integer):
+            valores = pd.array(valores, dtype="Int64")
+        columnas[nombre] = valores
+    return pd.DataFrame(columnas)
+
+
+# ----------------------------------------------------------------------
+#                                                         MAIN CLI
+# ----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precalcula (una sola vez) las métricas globales de todos los nodos de la red PPI filtrada."
+    )
+    parser.add_argument(
+        '--input',
+        required=True,
+        help="Ruta al archivo de entrada de la red (HUGO/TSV)."
+    )
+    parser.add_argument(
+        '--umbral',
+        type=int,
+        default=UMBRAL_SCORE,
+        help=f"Umbral mínimo de combined_score (default: {UMBRAL_SCORE})."
+    )
+    parser.add_argument(
+        '--k-betweenness',
+        type=int,
+        default=K_BETWEENNESS,
+        help=f"Nodos pivote para la betweenness aproximada; 0 = exacta (default: {K_BETWEENNESS})."
+    )
+    parser.add_argument(
+        '--forzar',
+        action='store_true',
+        help="Recalcula el índice aunque ya exista en caché."
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"[ERROR] Archivo no encontrado: {args.input}")
+        sys.exit(1)
+
+    if args.forzar:
+        G = grafo_filtrado(args.input, args.umbral)
+        indice = calcular_indice(G, k_betweenness=args.k_betweenness)
+        guardar_indice(indice, ruta_indice(args.input, args.umbral), firma=firma_red(args.input),
+                       umbral=args.umbral, k_betweenness=args.k_betweenness)
+    else:
+        indice = obtener_indice(args.input, args.umbral, k_betweenness=args.k_betweenness, exigir_pivotes=True)
+
+    print(f"Nodos indexados: {len(indice['nodos'])}")
+
+
+if __name__ == '__main__':
+    main()
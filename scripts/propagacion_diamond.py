@@ -10,8 +10,13 @@ import scipy.stats
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.special
+import scipy.sparse
+import scipy.sparse.linalg
 import operator
+import time
 import sys # Importado para manejo de rutas
+from indice_red import obtener_indice, consultar_indice
+from tabla_hipergeometrica import TablaHipergeometrica, log_pmf, log_colas, log_colas_interpoladas
 
 # --- Parámetros Globales ---
 nodos_añadidos = 200
@@ -105,18 +110,23 @@ def construir_red(interactions_df, SEED_GENES_HUGO):
 # ----------------------------------------------------------------------
 
 def compute_all_gamma_ln(N):
-        gamma_ln = {i: scipy.special.gammaln(i) for i in range(1, N + 1)}
+        # gamma_ln[i] = ln Γ(i) = ln (i-1)!, hasta N + 1 para poder evaluar ln N!
+        gamma_ln = {i: scipy.special.gammaln(i) for i in range(1, N + 2)}
         return gamma_ln
 
+def logchoose(n, k, gamma_ln):
+        """ln C(n, k) a partir de la tabla de ln Γ."""
+        return gamma_ln[n + 1] - (gamma_ln[k + 1] + gamma_ln[n - k + 1])
+
 def gauss_hypergeom(x, r, b, n, gamma_ln):
-        max_index = len(gamma_ln) - 1
+        max_index = len(gamma_ln)
         # Comprobaciones de límites
-        if r + b > max_index or r < 0 or b < 0 or n < 0 or x < 0 or r < x or b < (n - x) or n < x:
+        if r + b + 1 > max_index or r < 0 or b < 0 or n < 0 or x < 0 or r < x or b < (n - x) or n < x:
                 return 0 
 
         try:
                 # Cálculo del logaritmo de la probabilidad hipergeométrica
-                log_p = (gamma_ln[r] - (gamma_ln[x] + gamma_ln[r - x]) + gamma_ln[b] - (gamma_ln[n - x] + gamma_ln[b - n]) - gamma_ln[r + b])
+                log_p = logchoose(r, x, gamma_ln) + logchoose(b, n - x, gamma_ln) - logchoose(r + b, n, gamma_ln)
                 return np.exp(log_p)
         except KeyError:
                 return 0 
@@ -190,6 +200,473 @@ def diamond_iteration_of_first_X_nodes(G, S_valid, X, alpha=1):
                         
         return added_nodes
 
+def diamond_por_firmas(G, S_valid, X, contadores=None, gamma_ln=None, tabla=None):
+        """
+    DIAMOnD con los candidatos agrupados por su firma (k, kb): el p-valor se
+    evalúa una sola vez por par distinto y se descartan las firmas cuya cota
+    inferior (primer término de la cola) ya supera el mínimo actual.
+    Selección exacta y determinista: desempate por (p-valor, grado, símbolo).
+    Si se pasa un diccionario en `contadores`, se rellena con las estadísticas;
+    `gamma_ln` permite reutilizar una tabla ya calculada para la misma red.
+    Con `tabla` (TablaHipergeometrica del mismo N) los p-valores se leen como
+    log p de las tablas persistentes en lugar de sumarse término a término.
+    """
+        added_nodes = []
+        if contadores is None:
+                contadores = {}
+        for clave in ('candidatos', 'firmas', 'evaluaciones', 'podadas'):
+                contadores.setdefault(clave, 0)
+
+        if len(G.nodes) == 0 or not S_valid:
+                print("Grafo vacío o no hay genes semilla válidos para iniciar DIAMOnD.")
+                return []
+
+        # Las vistas de adyacencia y grado de NetworkX evitan copiar la red en cada llamada
+        neighbors = G.adj
+        degrees = G.degree
+        cluster_nodes = set(S_valid)
+        N = len(G.nodes)
+        if tabla is not None and tabla.N != N:
+                raise ValueError(f"La tabla hipergeométrica es para N={tabla.N}, pero la red tiene {N} nodos.")
+        if gamma_ln is None and tabla is None:
+                gamma_ln = compute_all_gamma_ln(N)
+
+        # kb de cada candidato (vecino del cluster), actualizado de forma incremental
+        kb_candidatos = {}
+        for seed in cluster_nodes:
+                for neighbor in neighbors[seed]:
+                        if neighbor not in cluster_nodes:
+                                kb_candidatos[neighbor] = kb_candidatos.get(neighbor, 0) + 1
+
+        for _ in tqdm(range(X), desc=f"DIAMOnD por firmas (Cluster inicial: {len(cluster_nodes)})"):
+                if not kb_candidatos:
+                        print("Todos los nodos vecinos han sido añadidos. Deteniendo la propagación.")
+                        break
+
+                s = len(cluster_nodes)
+
+                # Agrupar candidatos por firma (k, kb); cada firma guarda su símbolo menor
+                firmas = {}
+                for node, kb in kb_candidatos.items():
+                        firma = (degrees[node], kb)
+                        actual = firmas.get(firma)
+                        if actual is None or node < actual:
+                                firmas[firma] = node
+
+                contadores['candidatos'] += len(kb_candidatos)
+                contadores['firmas'] += len(firmas)
+
+                # Recorremos primero las firmas más prometedoras (kb alto, k bajo)
+                mejor = None
+                for k, kb in sorted(firmas, key=lambda f: (-f[1], f[0])):
+                        if tabla is not None:
+                                # Log p-valores leídos de las tablas persistentes; solo el rango
+                                # de la LRU (k > k_max) se poda antes con el primer término
+                                if k > tabla.k_max and mejor is not None and tabla.log_cota(kb, k, s) > mejor[0]:
+                                        contadores['podadas'] += 1
+                                        continue
+                                p = tabla.log_pvalue(kb, k, s)
+                        else:
+                                if mejor is not None and gauss_hypergeom(kb, s, N - s, k, gamma_ln) > mejor[0]:
+                                        contadores['podadas'] += 1
+                                        continue
+                                p = pvalue(kb, k, N, s, gamma_ln)
+                        contadores['evaluaciones'] += 1
+                        candidato = (p, k, firmas[(k, kb)])
+                        if mejor is None or candidato < mejor:
+                                mejor = candidato
+
+                next_node = mejor[2]
+                added_nodes.append(next_node)
+                cluster_nodes.add(next_node)
+                del kb_candidatos[next_node]
+                for neighbor in neighbors[next_node]:
+                        if neighbor not in cluster_nodes:
+                                kb_candidatos[neighbor] = kb_candidatos.get(neighbor, 0) + 1
+
+        ahorradas = contadores['candidatos'] - contadores['evaluaciones']
+        print(f"Evaluaciones de p-valor: {contadores['evaluaciones']} de {contadores['candidatos']} candidatos "
+              f"({contadores['firmas']} firmas distintas, {contadores['podadas']} podadas por cota, {ahorradas} ahorradas).")
+        if tabla is not None:
+                tabla.sincronizar()
+                contadores['tabla'] = tabla.estadisticas()
+                print(tabla.resumen())
+
+        return added_nodes
+
+def diamond_csr(G, S_valid, X, ponderado=False, contadores=None):
+        """
+    DIAMOnD sobre la adyacencia en arrays CSR (indptr, indices, data): al
+    añadir un nodo, los kb de sus vecinos se actualizan con una suma sobre su
+    fila. Con `ponderado=True`, `data` guarda el peso de cada enlace
+    (combined_score/1000), el grado es la suma de pesos y kb la suma de los
+    pesos hacia el cluster; la significancia usa la cola hipergeométrica
+    extendida a conteos no enteros (`log_colas_interpoladas`), que con pesos
+    1 coincide con DIAMOnD. Ambos caminos comparten el mismo código y coste.
+    Selección por firmas con poda por cota y desempate (p-valor, grado, símbolo).
+    """
+        added_nodes = []
+        if contadores is None:
+                contadores = {}
+        for clave in ('candidatos', 'firmas', 'evaluaciones', 'podadas'):
+                contadores.setdefault(clave, 0)
+
+        if len(G.nodes) == 0 or not S_valid:
+                print("Grafo vacío o no hay genes semilla válidos para iniciar DIAMOnD.")
+                return []
+
+        nodos = sorted(G.nodes)
+        N = len(nodos)
+        indice = {nodo: i for i, nodo in enumerate(nodos)}
+        peso = 'weight' if ponderado else None
+        A = nx.to_scipy_sparse_array(G, nodelist=nodos, weight=peso, format='csr', dtype=np.float64)
+        indptr, indices, data = A.indptr, A.indices, A.data
+        grados = np.array([G.degree(nodo, weight=peso) for nodo in nodos], dtype=np.float64)
+        log_p_firmas = log_colas_interpoladas if ponderado else log_colas
+
+        miembro = np.zeros(N, dtype=bool)
+        miembro[[indice[g] for g in S_valid if g in indice]] = True
+        kb = A @ miembro.astype(np.float64)
+        s = int(miembro.sum())
+
+        for _ in tqdm(range(X), desc=f"DIAMOnD CSR{' ponderado' if ponderado else ''} (Cluster inicial: {s})"):
+                candidatos = np.flatnonzero((kb > 0) & ~miembro)
+                if len(candidatos) == 0:
+                        print("Todos los nodos vecinos han sido añadidos. Deteniendo la propagación.")
+                        break
+
+                k, kb_c = grados[candidatos], kb[candidatos]
+                # Firma (k, kb) como número complejo: np.unique en 1D es mucho más rápido que con axis=0
+                firmas, inversa = np.unique(k + 1j * kb_c, return_inverse=True)
+                k_f, kb_f = firmas.real, firmas.imag
+                if ponderado:
+                        cota = log_colas_interpoladas(kb_f, k_f, N, s, cota=True)
+                else:
+                        cota = log_pmf(kb_f.astype(np.int64), k_f.astype(np.int64), N, s)
+
+                # Poda: se evalúa la firma de menor cota; las que superan su p-valor no pueden ser el mínimo
+                primera = int(np.argmin(cota))
+                umbral = log_p_firmas(kb_f[[primera]], k_f[[primera]], N, np.array([s]))[0]
+                evaluar = cota <= umbral
+                log_p = np.full(len(firmas), np.inf)
+                log_p[evaluar] = log_p_firmas(kb_f[evaluar], k_f[evaluar], N, np.full(int(evaluar.sum()), s))
+
+                contadores['candidatos'] += len(candidatos)
+                contadores['firmas'] += len(firmas)
+                contadores['evaluaciones'] += int(evaluar.sum())
+                contadores['podadas'] += int(len(firmas) - evaluar.sum())
+
+                # Los candidatos ya están en orden de símbolo: (p-valor, grado, símbolo)
+                next_idx = candidatos[np.lexsort((candidatos, k, log_p[inversa]))[0]]
+                added_nodes.append(nodos[next_idx])
+                miembro[next_idx] = True
+                s += 1
+                inicio, fin = indptr[next_idx], indptr[next_idx + 1]
+                kb[indices[inicio:fin]] += data[inicio:fin]
+
+        print(f"Evaluaciones de p-valor: {contadores['evaluaciones']} de {contadores['candidatos']} candidatos "
+              f"({contadores['firmas']} firmas distintas, {contadores['podadas']} podadas por cota).")
+
+        return added_nodes
+
+
+def diamond_por_lotes(G, S_valid, X, lote=None, salto=None, contadores=None):
+        """
+    DIAMOnD aproximado: en cada iteración se añaden de una vez los mejores
+    candidatos según (p-valor, grado, símbolo) en lugar de uno solo.
+    `lote` fija el máximo de nodos por iteración; con `salto` solo entran los
+    candidatos cuyo p-valor esté a menos de `salto` órdenes de magnitud del
+    mejor (siempre al menos uno). Con lote=1 y sin salto equivale al exacto.
+    Los p-valores de todas las firmas (k, kb) se evalúan vectorizados.
+    """
+        added_nodes = []
+        if contadores is None:
+                contadores = {}
+        for clave in ('iteraciones', 'candidatos', 'firmas'):
+                contadores.setdefault(clave, 0)
+        if lote is not None and lote < 1:
+                raise ValueError(f"El tamaño de lote debe ser >= 1 (recibido: {lote}).")
+        if salto is not None and (not np.isfinite(salto) or salto < 0):
+                raise ValueError(f"El salto de p-valor debe ser un número finito >= 0 (recibido: {salto}).")
+        if lote is None and salto is None:
+                lote = 1
+
+        if len(G.nodes) == 0 or not S_valid:
+                print("Grafo vacío o no hay genes semilla válidos para iniciar DIAMOnD.")
+                return []
+
+        neighbors = G.adj
+        degrees = G.degree
+        cluster_nodes = set(S_valid)
+        N = len(G.nodes)
+        limite_salto = None if salto is None else salto * np.log(10)
+
+        kb_candidatos = {}
+        for seed in cluster_nodes:
+                for neighbor in neighbors[seed]:
+                        if neighbor not in cluster_nodes:
+                                kb_candidatos[neighbor] = kb_candidatos.get(neighbor, 0) + 1
+
+        with tqdm(total=X, desc=f"DIAMOnD por lotes (Cluster inicial: {len(cluster_nodes)})") as barra:
+                while len(added_nodes) < X:
+                        if not kb_candidatos:
+                                print("Todos los nodos vecinos han sido añadidos. Deteniendo la propagación.")
+                                break
+
+                        # Candidatos en orden alfabético: el lexsort estable mantiene ese desempate
+                        candidatos = sorted(kb_candidatos)
+                        k = np.array([degrees[node] for node in candidatos], dtype=np.int64)
+                        kb = np.array([kb_candidatos[node] for node in candidatos], dtype=np.int64)
+                        firmas, inversa = np.unique(k * (N + 1) + kb, return_inverse=True)
+                        log_p = log_colas(firmas % (N + 1), firmas // (N + 1), N, np.full(len(firmas), len(cluster_nodes)))[inversa]
+                        orden = np.lexsort((k, log_p))
+
+                        tamaño = X - len(added_nodes)
+                        if lote is not None:
+                                tamaño = min(tamaño, lote)
+                        if limite_salto is not None:
+                                tamaño = min(tamaño, max(1, int(np.searchsorted(log_p[orden], log_p[orden[0]] + limite_salto, side='right'))))
+
+                        contadores['iteraciones'] += 1
+                        contadores['candidatos'] += len(candidatos)
+                        contadores['firmas'] += len(firmas)
+
+                        for pos in orden[:tamaño]:
+                                next_node = candidatos[pos]
+                                added_nodes.append(next_node)
+                                cluster_nodes.add(next_node)
+                                del kb_candidatos[next_node]
+                                for neighbor in neighbors[next_node]:
+                                        if neighbor not in cluster_nodes:
+                                                kb_candidatos[neighbor] = kb_candidatos.get(neighbor, 0) + 1
+                        barra.update(tamaño)
+
+        print(f"DIAMOnD por lotes: {len(added_nodes)} nodos en {contadores['iteraciones']} iteraciones "
+              f"({contadores['firmas']} firmas evaluadas).")
+
+        return added_nodes
+
+
+def solapamiento_rankings(aproximado, exacto, cortes=(10, 50, 100)):
+        """
+    Compara un ranking aproximado con el exacto: solapamiento de los primeros
+    n genes (|A_n ∩ E_n| / n) para cada corte, Jaccard de los conjuntos
+    completos y longitud del prefijo idéntico.
+    """
+        resultado = {}
+        for n in sorted({n for n in cortes if n <= len(exacto)} | {len(exacto)}):
+                if n > 0:
+                        resultado[f"Solapamiento_{n}"] = len(set(aproximado[:n]) & set(exacto[:n])) / n
+        union = set(aproximado) | set(exacto)
+        resultado['Jaccard'] = len(set(aproximado) & set(exacto)) / len(union) if union else 1.0
+        resultado['Prefijo_identico'] = next(
+                (i for i, (a, b) in enumerate(zip(aproximado, exacto)) if a != b), min(len(aproximado), len(exacto))
+        )
+        return resultado
+
+
+def diamond_multicluster(G, conjuntos_semilla, X, contadores=None):
+        """
+    DIAMOnD para varios conjuntos de semillas a la vez, avanzando en paralelo.
+    Los kb iniciales de todos los clusters salen de un solo SpMM, KB = A·M, con
+    M la matriz dispersa de semillas (nodos×clusters); en cada paso se suma
+    A·ΔM, donde ΔM (dispersa) contiene los nodos recién añadidos. KB y la
+    pertenencia se mantienen como arrays densos nodos×clusters. Los
+    p-valores se calculan una vez por firma (k, kb, s), con la misma poda por
+    cota inferior que `diamond_por_firmas`, y la selección por (p-valor, grado,
+    símbolo) de todos los clusters se hace con una sola ordenación.
+    `X` puede ser un entero o una lista con el número de nodos de cada conjunto.
+    Devuelve una lista de genes añadidos por conjunto.
+    """
+        C = len(conjuntos_semilla)
+        if contadores is None:
+                contadores = {}
+        for clave in ('candidatos', 'firmas', 'evaluaciones', 'podadas'):
+                contadores.setdefault(clave, 0)
+        if len(G.nodes) == 0 or C == 0:
+                return [[] for _ in range(C)]
+
+        nodos = sorted(G.nodes)
+        N = len(nodos)
+        indice = {nodo: i for i, nodo in enumerate(nodos)}
+        A = nx.to_scipy_sparse_array(G, nodelist=nodos, weight=None, format='csr', dtype=np.int32)
+        grados = np.array([G.degree(nodo) for nodo in nodos], dtype=np.int64)
+        objetivo = np.broadcast_to(np.asarray(X, dtype=np.int64), (C,)).copy()
+
+        # Semillas como matriz dispersa y recuentos kb de todos los clusters en un solo SpMM
+        filas = [indice[g] for semillas in conjuntos_semilla for g in dict.fromkeys(semillas) if g in indice]
+        columnas = [j for j, semillas in enumerate(conjuntos_semilla) for g in dict.fromkeys(semillas) if g in indice]
+        M = scipy.sparse.csc_matrix((np.ones(len(filas), dtype=np.int32), (filas, columnas)), shape=(N, C))
+        KB = (A @ M).toarray()
+        # A partir de aquí la pertenencia es densa (nodos×clusters); M ya no se usa
+        miembro = M.toarray().astype(bool)
+        s = miembro.sum(axis=0).astype(np.int64)
+        del M
+
+        añadidos = np.full((max(int(objetivo.max()), 0), C), -1, dtype=np.int64)
+        activos = (objetivo > 0) & (s > 0)
+        base = np.int64(N + 1)
+
+        for paso in tqdm(range(añadidos.shape[0]), desc=f"DIAMOnD multi-cluster ({C} conjuntos)"):
+                activos &= paso < objetivo
+                i, c = np.nonzero((KB > 0) & ~miembro & activos[None, :])
+                if len(i) == 0:
+                        break
+
+                # Firmas (k, kb, s) distintas de todos los clusters
+                k, kb, sc = grados[i], KB[i, c].astype(np.int64), s[c]
+                firmas, inversa = np.unique((k * base + kb) * base + sc, return_inverse=True)
+                k_f, kb_f, s_f = firmas // (base * base), (firmas // base) % base, firmas % base
+                cota = log_pmf(kb_f, k_f, N, s_f)
+
+                # Poda: en cada cluster se evalúa la firma de menor cota; las firmas cuya cota
+                # supera ese p-valor en todos sus clusters no pueden ser el mínimo
+                pares = np.unique(inversa * C + c)
+                f_par, c_par = pares // C, pares % C
+                orden = np.lexsort((cota[f_par], c_par))
+                primeros = orden[np.r_[True, c_par[orden][1:] != c_par[orden][:-1]]]
+                umbral = np.full(C, np.inf)
+                umbral[c_par[primeros]] = log_colas(kb_f[f_par[primeros]], k_f[f_par[primeros]], N, s_f[f_par[primeros]])
+                evaluar = np.zeros(len(firmas), dtype=bool)
+                evaluar[f_par[cota[f_par] <= umbral[c_par]]] = True
+
+                log_p = np.full(len(firmas), np.inf)
+                log_p[evaluar] = log_colas(kb_f[evaluar], k_f[evaluar], N, s_f[evaluar])
+
+                contadores['candidatos'] += len(i)
+                contadores['firmas'] += len(firmas)
+                contadores['evaluaciones'] += int(evaluar.sum())
+                contadores['podadas'] += int(len(firmas) - evaluar.sum())
+
+                # Mejor candidato de cada cluster: (p-valor, grado, símbolo) con una sola ordenación
+                orden = np.lexsort((i, k, log_p[inversa], c))
+                primeros = orden[np.r_[True, c[orden][1:] != c[orden][:-1]]]
+                nuevos, clusters = i[primeros], c[primeros]
+
+                # Los clusters activos sin candidatos se detienen
+                con_candidatos = np.zeros(C, dtype=bool)
+                con_candidatos[clusters] = True
+                activos &= con_candidatos
+
+                # Actualización incremental: KB += A·ΔM
+                delta = scipy.sparse.csc_matrix(
+                        (np.ones(len(nuevos), dtype=np.int32), (nuevos, clusters)), shape=(N, C)
+                )
+                incremento = (A @ delta).tocoo()
+                KB[incremento.row, incremento.col] += incremento.data
+                miembro[nuevos, clusters] = True
+                s[clusters] += 1
+                añadidos[paso, clusters] = nuevos
+
+        print(f"Evaluaciones de p-valor: {contadores['evaluaciones']} de {contadores['candidatos']} pares candidato-cluster "
+              f"({contadores['firmas']} firmas distintas, {contadores['podadas']} podadas por cota).")
+
+        return [[nodos[j] for j in añadidos[:objetivo[col], col] if j >= 0] for col in range(C)]
+
+# ----------------------------------------------------------------------
+#                                 FUNCIONES RWR / DIFUSIÓN (MATRICES DISPERSAS)
+# ----------------------------------------------------------------------
+
+def construir_matriz_transicion(G):
+        """
+    Devuelve la lista ordenada de nodos y la matriz de transición W = A·D^-1
+    (CSR, columnas normalizadas) de la red sin pesos.
+    """
+        nodos = sorted(G.nodes)
+        A = nx.to_scipy_sparse_array(G, nodelist=nodos, weight=None, format='csr', dtype=np.float64)
+        grados = np.asarray(A.sum(axis=0)).ravel()
+        inv_grados = np.divide(1.0, grados, out=np.zeros_like(grados), where=grados > 0)
+        W = (A @ scipy.sparse.diags(inv_grados)).tocsr()
+        return nodos, W
+
+
+def construir_matriz_semillas(nodos, conjuntos_semilla):
+        """
+    Construye la matriz dispersa nodos×conjuntos P0: cada columna es la
+    distribución inicial (uniforme sobre las semillas válidas) de un conjunto.
+    """
+        indice = {nodo: i for i, nodo in enumerate(nodos)}
+        filas, columnas, valores = [], [], []
+        for j, semillas in enumerate(conjuntos_semilla):
+                idx = sorted({indice[g] for g in semillas if g in indice})
+                if not idx:
+                        continue
+                filas.extend(idx)
+                columnas.extend([j] * len(idx))
+                valores.extend([1.0 / len(idx)] * len(idx))
+        return scipy.sparse.csr_matrix(
+                (valores, (filas, columnas)), shape=(len(nodos), len(conjuntos_semilla))
+        )
+
+
+def propagacion_rwr(W, P0, reinicio=0.3, tol=1e-8, max_iter=1000):
+        """
+    Random walk with restart por iteración de potencias sobre todas las
+    columnas a la vez: P(t+1) = (1 - r)·W·P(t) + r·P0.
+    """
+        if not 0 < reinicio <= 1:
+                raise ValueError(f"La probabilidad de reinicio debe estar en (0, 1] (recibido: {reinicio}).")
+        P0 = P0.toarray()
+        P = P0.copy()
+        for _ in range(max_iter):
+                P_next = (1.0 - reinicio) * (W @ P) + reinicio * P0
+                delta = np.abs(P_next - P).sum(axis=0).max() if P.size else 0.0
+                P = P_next
+                if delta < tol:
+                        break
+        else:
+                print(f"Advertencia: RWR no convergió en {max_iter} iteraciones (delta={delta:.2e}).")
+        return P
+
+
+def propagacion_calor(W, P0, t=1.0):
+        """
+    Difusión de calor F = exp(-t·L)·P0 con L = I - W. Se evalúa con
+    `expm_multiply` (escalado y truncamiento con control de error) sobre todas
+    las columnas de P0 a la vez, estable también para tiempos grandes.
+    """
+        if not np.isfinite(t) or t < 0:
+                raise ValueError(f"El tiempo de difusión debe ser un número finito >= 0 (recibido: {t}).")
+        L = scipy.sparse.identity(W.shape[0], format='csr') - W
+        return scipy.sparse.linalg.expm_multiply(-t * L, P0.toarray())
+
+
+def ranking_propagacion(nodos, puntuaciones, semillas, X):
+        """
+    Devuelve los X nodos no semilla con mayor puntuación (> 0), con desempate
+    alfabético para que el orden sea determinista.
+    """
+        semillas = set(semillas)
+        candidatos = [
+                (-puntuaciones[i], nodo) for i, nodo in enumerate(nodos)
+                if nodo not in semillas and puntuaciones[i] > 0
+        ]
+        candidatos.sort()
+        return [nodo for _, nodo in candidatos[:X]]
+
+
+def propagacion_matricial(G, conjuntos_semilla, X, metodo='rwr', reinicio=0.3, t=1.0, matriz=None):
+        """
+    Puntúa todos los conjuntos de semillas en una sola pasada de SpMM y
+    devuelve, para cada uno, la lista de los X genes candidatos mejor situados.
+    `matriz` permite reutilizar un (nodos, W) ya construido para la misma red.
+    """
+        if len(G.nodes) == 0 or not conjuntos_semilla:
+                return [[] for _ in conjuntos_semilla]
+
+        nodos, W = matriz if matriz is not None else construir_matriz_transicion(G)
+        P0 = construir_matriz_semillas(nodos, conjuntos_semilla)
+
+        print(f"Propagación '{metodo}' sobre {len(nodos)} nodos y {P0.shape[1]} conjuntos de semillas...")
+        if metodo == 'rwr':
+                P = propagacion_rwr(W, P0, reinicio=reinicio)
+        elif metodo == 'calor':
+                P = propagacion_calor(W, P0, t=t)
+        else:
+                raise ValueError(f"Método de propagación no reconocido: {metodo}")
+
+        return [ranking_propagacion(nodos, P[:, j], semillas, X) for j, semillas in enumerate(conjuntos_semilla)]
+
 # ----------------------------------------------------------------------
 #                                                 FUNCIONES DE GUARDADO
 # ----------------------------------------------------------------------
@@ -260,6 +737,22 @@ def guardar_resultados(seed_genes_hugo, diamond_genes_hugo, archivo_salida):
         results_df.to_csv(archivo_salida, sep="\t", index=False, header=False)
         print(f"\nResultados de DIAMOnD guardados en: {archivo_salida} ({len(results_df)} genes)")
 
+def guardar_resultados_indice(seed_genes_hugo, diamond_genes_hugo, indice, archivo_salida):
+        """
+        Guarda los genes añadidos (en orden de incorporación) junto con sus
+        métricas globales en la red, consultadas en el índice precomputado.
+        """
+        seed_set = set(seed_genes_hugo)
+        diamond_only_genes = [gene for gene in diamond_genes_hugo if gene not in seed_set]
+
+        results_df = pd.DataFrame({
+                'Rank': range(1, len(diamond_only_genes) + 1),
+                'HUGO_Symbol': diamond_only_genes
+        })
+        results_df = pd.concat([results_df, consultar_indice(indice, diamond_only_genes)], axis=1)
+        results_df.to_csv(archivo_salida, sep="\t", index=False)
+        print(f"Resultados con métricas globales guardados en: {archivo_salida}")
+
 def graficar_red_enriquecida(G, seed_genes_valid, diamond_genes_hugo, output_image_file):
         """
     Genera la visualización de la red enriquecida. Solo incluye los genes 
@@ -346,7 +839,8 @@ def main():
         parser.add_argument(
                 '--seed-file', 
                 required=True, 
-                help="Ruta al archivo de texto que contiene los genes semilla (HUGO)."
+                nargs='+',
+                help="Ruta al archivo (o archivos) de texto con los genes semilla (HUGO). Cada archivo es un conjunto."
         )
         parser.add_argument(
                 '--input', 
@@ -363,9 +857,72 @@ def main():
                 default='diamond_network.png', 
                 help="Nombre del archivo para la imagen de la red DIAMOnD."
         )
+        parser.add_argument(
+                '--metodo',
+                choices=['diamond', 'rwr', 'calor'],
+                default='diamond',
+                help="Motor de propagación: DIAMOnD, random walk with restart o difusión de calor (default: diamond)."
+        )
+        parser.add_argument(
+                '--reinicio',
+                type=float,
+                default=0.3,
+                help="Probabilidad de reinicio para RWR (default: 0.3)."
+        )
+        parser.add_argument(
+                '--tiempo',
+                type=float,
+                default=1.0,
+                help="Tiempo de difusión para el método de calor (default: 1.0)."
+        )
+        parser.add_argument(
+                '--sin-indice',
+                action='store_true',
+                help="No añade las métricas globales del índice de la red a los resultados."
+        )
+        parser.add_argument(
+                '--sin-tabla',
+                action='store_true',
+                help="DIAMOnD calcula los p-valores sin las tablas hipergeométricas persistentes (data/cache_hipergeometrica)."
+        )
+        parser.add_argument(
+                '--multicluster',
+                action='store_true',
+                help="Con varios conjuntos de semillas, DIAMOnD los hace avanzar a la vez (kb por producto de matrices dispersas)."
+        )
+        parser.add_argument(
+                '--lote',
+                type=int,
+                default=None,
+                help="Modo aproximado: añade hasta B candidatos por iteración (compara con el ranking exacto)."
+        )
+        parser.add_argument(
+                '--salto-p',
+                type=float,
+                default=None,
+                help="Modo aproximado: añade los candidatos a menos de G órdenes de magnitud del mejor p-valor."
+        )
+        parser.add_argument(
+                '--ponderado',
+                action='store_true',
+                help="DIAMOnD ponderado: cuenta los enlaces al cluster con su peso (combined_score/1000)."
+        )
         args = parser.parse_args()
+        if not np.isfinite(args.tiempo) or args.tiempo < 0:
+                parser.error("--tiempo debe ser un número finito >= 0.")
+        if not 0 < args.reinicio <= 1:
+                parser.error("--reinicio debe estar en (0, 1].")
+        aproximado = args.lote is not None or args.salto_p is not None
+        if args.ponderado and (args.metodo != 'diamond' or args.multicluster or aproximado):
+                parser.error("--ponderado solo se aplica a --metodo diamond sin --multicluster, --lote ni --salto-p.")
+        if aproximado and (args.metodo != 'diamond' or args.multicluster):
+                parser.error("--lote y --salto-p solo se aplican a --metodo diamond sin --multicluster.")
+        if args.lote is not None and args.lote < 1:
+                parser.error("--lote debe ser >= 1.")
+        if args.salto_p is not None and (not np.isfinite(args.salto_p) or args.salto_p < 0):
+                parser.error("--salto-p debe ser un número finito >= 0.")
         
-        print(f"--- Iniciando Propagación DIAMOnD para {nodos_añadidos} Nodos ---")
+        print(f"--- Iniciando Propagación ({args.metodo}) para {nodos_añadidos} Nodos ---")
         
         # 2. Creación de la Carpeta de Resultados
         # Se usa sys.argv[0] para obtener la ruta del script
@@ -382,17 +939,15 @@ def main():
                 os.makedirs(RESULTS_DIR)
                 print(f"Carpeta de resultados creada: {RESULTS_DIR}")
 
-        output_tsv_path = os.path.join(RESULTS_DIR, args.output)
-        output_plot_path = os.path.join(RESULTS_DIR, args.plot)
-        # RUTA DEL ARCHIVO DE GENES AISLADOS
-        output_isolated_path = os.path.join(RESULTS_DIR, 'isolated_seed_genes.tsv')
-        # NUEVA RUTA DEL ARCHIVO DE GENES CONECTADOS
-        output_connected_path = os.path.join(RESULTS_DIR, 'connected_seed_genes.tsv')
-
         ## 3. CARGA DE DATOS
-        genes_semilla_hugo = importar_genes(args.seed_file)
-        
-        if not genes_semilla_hugo:
+        # Cada archivo de semillas es un conjunto independiente (p. ej. una ruta)
+        conjuntos = {}
+        for seed_file in args.seed_file:
+                genes = importar_genes(seed_file)
+                if genes:
+                        conjuntos[os.path.splitext(os.path.basename(seed_file))[0]] = genes
+
+        if not conjuntos:
                 return
                 
         # Carga y filtrado (usando el alto umbral definido)
@@ -402,38 +957,106 @@ def main():
 
         ## 4. CONSTRUIR GRAFO y obtener semillas VÁLIDAS
         # La función construir_red devuelve el grafo y la lista de semillas válidas (conectadas)
-        red, genes_semilla_valid = construir_red(interacciones, genes_semilla_hugo)
-        
-        # Generar el archivo de genes conectados
-        guardar_genes_semilla_conectados(genes_semilla_valid, output_connected_path)
+        primer_conjunto = next(iter(conjuntos.values()))
+        red, _ = construir_red(interacciones, primer_conjunto)
 
-        # Análisis temprano si no hay semillas válidas
-        if not genes_semilla_valid:
-                print("Ningún gen semilla está conectado a la red con el umbral especificado. Abortando DIAMOnD.")
-                analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, output_isolated_path)
-                return
-        
-        # Determinamos el número real de nodos a añadir
-        n = min(nodos_añadidos, len(red.nodes) - len(genes_semilla_valid))
-        if n <= 0:
-                print("No hay nodos para añadir o la red es muy pequeña respecto al set de semillas válidas.")
-                # Aún analizamos y guardamos los aislados para dejar constancia
-                analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, output_isolated_path)
+        # Con varios conjuntos, los archivos de salida llevan el nombre del conjunto como sufijo
+        varios = len(conjuntos) > 1
+
+        def ruta_salida(nombre_archivo, conjunto):
+                if not varios:
+                        return os.path.join(RESULTS_DIR, nombre_archivo)
+                base, ext = os.path.splitext(nombre_archivo)
+                return os.path.join(RESULTS_DIR, f"{base}_{conjunto}{ext}")
+
+        pendientes = []
+        for nombre, genes_semilla_hugo in conjuntos.items():
+                genes_semilla_valid = [gene for gene in genes_semilla_hugo if gene in red]
+                output_isolated_path = ruta_salida('isolated_seed_genes.tsv', nombre)
+
+                # Generar el archivo de genes conectados
+                guardar_genes_semilla_conectados(genes_semilla_valid, ruta_salida('connected_seed_genes.tsv', nombre))
+
+                # Análisis temprano si no hay semillas válidas
+                if not genes_semilla_valid:
+                        print(f"[{nombre}] Ningún gen semilla está conectado a la red con el umbral especificado. Abortando la propagación.")
+                        analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, output_isolated_path)
+                        continue
+
+                # Determinamos el número real de nodos a añadir
+                n = min(nodos_añadidos, len(red.nodes) - len(genes_semilla_valid))
+                if n <= 0:
+                        print(f"[{nombre}] No hay nodos para añadir o la red es muy pequeña respecto al set de semillas válidas.")
+                        # Aún analizamos y guardamos los aislados para dejar constancia
+                        analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, output_isolated_path)
+                        continue
+
+                pendientes.append((nombre, genes_semilla_hugo, genes_semilla_valid, n))
+
+        if not pendientes:
                 return
 
-        ## 5. EJECUTAR DIAMOnD (Usando solo las semillas VÁLIDAS)
-        print(f"\n--- Ejecutando DIAMOnD para añadir {n} nodos (Cluster inicial: {len(genes_semilla_valid)} genes conectados) ---")
-        # Pasamos solo los genes válidos a la función DIAMOnD
-        diamond_genes = diamond_iteration_of_first_X_nodes(red, genes_semilla_valid, n)
+        ## 5. EJECUTAR LA PROPAGACIÓN (Usando solo las semillas VÁLIDAS)
+        if args.metodo == 'diamond' and args.multicluster:
+                print(f"\n--- Ejecutando DIAMOnD multi-cluster para {len(pendientes)} conjuntos de semillas ---")
+                resultados = diamond_multicluster(
+                        red, [valid for _, _, valid, _ in pendientes], [n for *_, n in pendientes]
+                )
+        elif args.metodo == 'diamond':
+                resultados = []
+                # Una sola tabla de log p-valores para todos los conjuntos (y ejecuciones) sobre esta red
+                tabla = None if args.sin_tabla else TablaHipergeometrica(len(red.nodes))
+                for nombre, _, genes_semilla_valid, n in pendientes:
+                        print(f"\n--- Ejecutando DIAMOnD para añadir {n} nodos (Cluster inicial: {len(genes_semilla_valid)} genes conectados) ---")
+                        # Pasamos solo los genes válidos a la función DIAMOnD
+                        if args.ponderado:
+                                resultados.append(diamond_csr(red, genes_semilla_valid, n, ponderado=True))
+                                continue
+                        inicio = time.perf_counter()
+                        exactos = diamond_por_firmas(red, genes_semilla_valid, n, tabla=tabla)
+                        t_exacto = time.perf_counter() - inicio
+                        if not aproximado:
+                                resultados.append(exactos)
+                                continue
+
+                        # Modo aproximado: se informa siempre de su parecido con el ranking exacto
+                        inicio = time.perf_counter()
+                        aproximados = diamond_por_lotes(red, genes_semilla_valid, n, lote=args.lote, salto=args.salto_p)
+                        t_aproximado = time.perf_counter() - inicio
+                        comparacion = {'Conjunto': nombre, 'Lote': args.lote, 'Salto_p': args.salto_p,
+                                       'T_exacto_s': t_exacto, 'T_aproximado_s': t_aproximado}
+                        comparacion.update(solapamiento_rankings(aproximados, exactos))
+                        print(f"[{nombre}] Aproximado vs exacto: Jaccard {comparacion['Jaccard']:.3f}, "
+                              + ", ".join(f"{clave.replace('_', '@')} {valor:.2f}" for clave, valor in comparacion.items()
+                                          if clave.startswith('Solapamiento_'))
+                              + f" ({t_aproximado:.2f} s frente a {t_exacto:.2f} s)")
+                        base, _ = os.path.splitext(args.output)
+                        pd.DataFrame([comparacion]).to_csv(ruta_salida(f"{base}_aproximado_vs_exacto.tsv", nombre), sep="\t", index=False)
+                        resultados.append(aproximados)
+        else:
+                # Todos los conjuntos se puntúan a la vez como columnas de una matriz dispersa
+                n_max = max(n for *_, n in pendientes)
+                resultados = propagacion_matricial(
+                        red, [valid for _, _, valid, _ in pendientes], n_max,
+                        metodo=args.metodo, reinicio=args.reinicio, t=args.tiempo
+                )
+                resultados = [ranking[:n] for ranking, (*_, n) in zip(resultados, pendientes)]
 
-        ## 6. GUARDAR Y GRAFICAR RESULTADOS
-        guardar_resultados(genes_semilla_hugo, diamond_genes, output_tsv_path)
-        
-        # Graficar, usando solo los genes VÁLIDOS y los añadidos por DIAMOnD
-        graficar_red_enriquecida(red, genes_semilla_valid, diamond_genes, output_plot_path)
+        # Índice de métricas globales (se calcula una vez y queda en caché junto a la red)
+        indice = None if args.sin_indice else obtener_indice(args.input, UMBRAL_SCORE, G=red)
+
+        for (nombre, genes_semilla_hugo, genes_semilla_valid, _), diamond_genes in zip(pendientes, resultados):
+                ## 6. GUARDAR Y GRAFICAR RESULTADOS
+                guardar_resultados(genes_semilla_hugo, diamond_genes, ruta_salida(args.output, nombre))
+                if indice is not None:
+                        base, ext = os.path.splitext(args.output)
+                        guardar_resultados_indice(genes_semilla_hugo, diamond_genes, indice, ruta_salida(f"{base}_global{ext}", nombre))
+                
+                # Graficar, usando solo los genes VÁLIDOS y los añadidos por la propagación
+                graficar_red_enriquecida(red, genes_semilla_valid, diamond_genes, ruta_salida(args.plot, nombre))
 
-        ## 7. GUARDAR GENES AISLADOS Y MOSTRAR CONTROL
-        analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, output_isolated_path)
+                ## 7. GUARDAR GENES AISLADOS Y MOSTRAR CONTROL
+                analizar_y_guardar_genes_aislados(genes_semilla_hugo, genes_semilla_valid, UMBRAL_SCORE, ruta_salida('isolated_seed_genes.tsv', nombre))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,363 @@
+# ----------------------------------------------------------------------
+#          SERVICIO LOCAL DE PROPAGACIÓN (RED CARGADA EN MEMORIA)
+# ----------------------------------------------------------------------
+import os
+import argparse
+import sys
+import json
+import math
+import time
+import threading
+import socket
+import socketserver
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from propagacion_diamond import (
+    UMBRAL_SCORE, nodos_añadidos, cargar_red_conocida, construir_red,
+    diamond_por_firmas, construir_matriz_transicion,
+    propagacion_matricial,
+)
+from tabla_hipergeometrica import TablaHipergeometrica
+from indice_red import obtener_indice, consultar_indice
+from enriquecimiento_funcional import (
+    ENRICHR_URL, CACHE_DIR, calcular_propiedades, enriquecer_lista,
+)
+
+# --- Parámetros Globales ---
+HOST = "127.0.0.1"
+PUERTO = 8765
+MAX_CUERPO = 10 * 1024 * 1024  # tamaño máximo de una petición (bytes)
+LIBRERIAS_DEFECTO = ["KEGG_2021_Human", "GO_Biological_Process_2021"]
+
+
+class PeticionInvalida(ValueError):
+    """Error en los datos de una petición (se responde con 400)."""
+
+
+class EstadoServicio:
+    """
+    Red, índice global y estructuras derivadas cargadas una sola vez. Todo es
+    de solo lectura tras la carga, por lo que se comparte entre hilos; la
+    tabla hipergeométrica solo añade filas, siempre con los mismos valores.
+    """
+
+    def __init__(self, network_file, umbral=UMBRAL_SCORE, usar_indice=True,
+                 enrichr_url=ENRICHR_URL, cache_dir=CACHE_DIR):
+        inicio = time.time()
+        interacciones = cargar_red_conocida(network_file, umbral)
+        if interacciones is None or interacciones.empty:
+            raise RuntimeError(f"No se pudo cargar la red: {network_file}")
+
+        self.red, _ = construir_red(interacciones, [])
+        self.umbral = umbral
+        self.tabla = TablaHipergeometrica(len(self.red.nodes))
+        self.matriz = construir_matriz_transicion(self.red)
+        self.indice = obtener_indice(network_file, umbral, G=self.red) if usar_indice else None
+        self.enrichr_url = enrichr_url
+        self.cache_dir = cache_dir
+        self.inicio = time.time()
+        self.peticiones = 0
+        self._lock = threading.Lock()
+        print(f"Servicio listo en {self.inicio - inicio:.1f} s "
+              f"({self.red.number_of_nodes()} nodos, {self.red.number_of_edges()} enlaces).")
+
+    def contar_peticion(self):
+        with self._lock:
+            self.peticiones += 1
+
+    # --- Consultas ---
+
+    def estado(self, _datos=None):
+        return {
+            'nodos': self.red.number_of_nodes(),
+            'enlaces': self.red.number_of_edges(),
+            'umbral': self.umbral,
+            'indice': self.indice is not None,
+            'peticiones': self.peticiones,
+            'activo_segundos': round(time.time() - self.inicio, 1),
+            'tabla_hipergeometrica': self.tabla.estadisticas(),
+        }
+
+    def propagacion(self, datos):
+        genes = lista_genes(datos, 'genes')
+        metodo = datos.get('metodo', 'diamond')
+        n = parametro_numerico(datos, 'n', nodos_añadidos, int, minimo=1)
+
+        validas = [g for g in genes if g in self.red]
+        aisladas = [g for g in genes if g not in self.red]
+        n = min(n, len(self.red.nodes) - len(validas))
+
+        candidatos = []
+        contadores = {}
+        if validas and n > 0:
+            if metodo == 'diamond':
+                candidatos = diamond_por_firmas(self.red, validas, n, contadores=contadores, tabla=self.tabla)
+            elif metodo in ('rwr', 'calor'):
+                candidatos = propagacion_matricial(
+                    self.red, [validas], n, metodo=metodo,
+                    reinicio=parametro_numerico(datos, 'reinicio', 0.3, float, minimo=0.0, maximo=1.0,
+                                                minimo_incluido=False),
+                    t=parametro_numerico(datos, 'tiempo', 1.0, float, minimo=0.0),
+                    matriz=self.matriz
+                )[0]
+            else:
+                raise PeticionInvalida(f"Método de propagación no reconocido: {metodo}")
+
+        respuesta = {
+            'metodo': metodo,
+            'semillas_validas': validas,
+            'semillas_aisladas': aisladas,
+            'candidatos': candidatos,
+        }
+        if contadores:
+            respuesta['contadores'] = contadores
+        if self.indice is not None:
+            respuesta['candidatos_global'] = tabla_a_registros(consultar_indice(self.indice, candidatos), candidatos)
+        return respuesta
+
+    def estructura(self, datos):
+        semillas = lista_genes(datos, 'semillas')
+        candidatos = lista_genes(datos, 'candidatos', defecto=[], vacia=True)
+        df, modularidad, _ = calcular_propiedades(self.red, semillas, candidatos, indice=self.indice)
+        return {
+            'modularidad': modularidad,
+            'metricas': json.loads(df.to_json(orient='records')),
+        }
+
+    def enriquecimiento(self, datos):
+        genes = lista_genes(datos, 'genes')
+        librerias = lista_genes(datos, 'librerias', defecto=LIBRERIAS_DEFECTO)
+        top = parametro_numerico(datos, 'top', 50, int, minimo=1)
+        df = enriquecer_lista(genes, librerias, url=self.enrichr_url, cache_dir=self.cache_dir)
+        return {'resultados': json.loads(df.head(top).to_json(orient='records'))}
+
+
+def lista_genes(datos, clave, defecto=None, vacia=False):
+    """
+    Extrae de la petición una lista de textos (genes o librerías) sin repetidos.
+    Sin `defecto` la clave es obligatoria; salvo vacia=True, la lista no puede quedar vacía.
+    """
+    valores = datos.get(clave, defecto)
+    # Una cadena suelta se iteraría carácter a carácter: solo se aceptan listas de textos
+    if not isinstance(valores, list) or not all(isinstance(v, str) for v in valores):
+        raise PeticionInvalida(f"Se esperaba una lista de textos en '{clave}'.")
+    valores = list(dict.fromkeys(v.strip() for v in valores if v.strip()))
+    if not valores and not vacia:
+        raise PeticionInvalida(f"Se esperaba una lista no vacía en '{clave}'.")
+    return valores
+
+
+def parametro_numerico(datos, clave, defecto, tipo, minimo=None, maximo=None, minimo_incluido=True):
+    """Lee un parámetro numérico opcional de la petición y comprueba su rango."""
+    valor = datos.get(clave, defecto)
+    # bool es subclase de int; los enteros no admiten decimales ni cadenas como "2.5"
+    if isinstance(valor, bool) or (tipo is int and isinstance(valor, float) and not valor.is_integer()):
+        raise PeticionInvalida(f"Valor no válido en '{clave}': {valor!r}")
+    try:
+        valor = tipo(valor)
+    except (TypeError, ValueError, OverflowError):
+        raise PeticionInvalida(f"Valor no válido en '{clave}': {valor!r}")
+    por_debajo = minimo is not None and (valor < minimo if minimo_incluido else valor <= minimo)
+    if not math.isfinite(valor) or por_debajo or (maximo is not None and valor > maximo):
+        raise PeticionInvalida(f"Valor fuera de rango en '{clave}': {valor!r}")
+    return valor
+
+
+def tabla_a_registros(df, genes):
+    """Convierte las métricas globales en una lista de dicts con el símbolo incluido."""
+    registros = json.loads(df.to_json(orient='records'))
+    for gen, registro in zip(genes, registros):
+        registro['HUGO_Symbol'] = gen
+    return registros
+
+
+# ----------------------------------------------------------------------
+#                                                 SERVIDOR HTTP
+# ----------------------------------------------------------------------
+
+RUTAS_GET = {'/estado': 'estado'}
+RUTAS_POST = {
+    '/propagacion': 'propagacion',
+    '/estructura': 'estructura',
+    '/enriquecimiento': 'enriquecimiento',
+}
+
+
+class ManejadorPropagacion(BaseHTTPRequestHandler):
+    """Atiende peticiones JSON sobre el estado compartido del servidor."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        # En sockets Unix client_address no es una tupla (host, puerto)
+        print(f"[{self.log_date_time_string()}] {formato % args}")
+
+    def responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def atender(self, rutas, datos):
+        estado = self.server.estado
+        nombre = rutas.get(self.path.split('?', 1)[0])
+        if nombre is None:
+            self.responder(404, {'error': f"Ruta no encontrada: {self.path}"})
+            return
+        estado.contar_peticion()
+        inicio = time.perf_counter()
+        try:
+            resultado = getattr(estado, nombre)(datos)
+        except PeticionInvalida as e:
+            self.responder(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.responder(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        resultado['tiempo_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        self.responder(200, resultado)
+
+    def do_GET(self):
+        self.atender(RUTAS_GET, {})
+
+    def do_POST(self):
+        longitud = int(self.headers.get('Content-Length', 0))
+        if longitud > MAX_CUERPO:
+            self.responder(413, {'error': "Petición demasiado grande."})
+            return
+        try:
+            datos = json.loads(self.rfile.read(longitud) or b"{}")
+        except json.JSONDecodeError as e:
+            self.responder(400, {'error': f"JSON no válido: {e}"})
+            return
+        if not isinstance(datos, dict):
+            self.responder(400, {'error': "El cuerpo debe ser un objeto JSON."})
+            return
+        self.atender(RUTAS_POST, datos)
+
+
+class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def crear_servidor(estado, host=HOST, puerto=PUERTO, socket_path=None):
+    """Crea el servidor (TCP local o socket Unix) con el estado ya cargado."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        servidor = ServidorUnix(socket_path, ManejadorPropagacion)
+    else:
+        servidor = ThreadingHTTPServer((host, puerto), ManejadorPropagacion)
+        servidor.daemon_threads = True
+    servidor.estado = estado
+    return servidor
+
+
+class ConexionUnix(http.client.HTTPConnection):
+    """Conexión HTTP sobre un socket Unix (para clientes locales)."""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def consultar_servicio(ruta, datos=None, host=HOST, puerto=PUERTO, socket_path=None, timeout=60):
+    """Cliente mínimo: envía una consulta al servicio y devuelve (código, respuesta JSON)."""
+    if socket_path:
+        conexion = ConexionUnix(socket_path, timeout=timeout)
+    else:
+        conexion = http.client.HTTPConnection(host, puerto, timeout=timeout)
+    try:
+        if datos is None:
+            conexion.request("GET", ruta)
+        else:
+            cuerpo = json.dumps(datos).encode("utf-8")
+            conexion.request("POST", ruta, body=cuerpo, headers={"Content-Type": "application/json"})
+        respuesta = conexion.getresponse()
+        return respuesta.status, json.loads(respuesta.read())
+    finally:
+        conexion.close()
+
+
+# ----------------------------------------------------------------------
+#                                                         MAIN CLI
+# ----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Servicio local que mantiene la red PPI en memoria y responde consultas de propagación, "
+                    "métricas estructurales y enriquecimiento."
+    )
+    parser.add_argument(
+        '--input',
+        required=True,
+        help="Ruta al archivo de entrada de la red (HUGO/TSV)."
+    )
+    parser.add_argument(
+        '--umbral',
+        type=int,
+        default=UMBRAL_SCORE,
+        help=f"Umbral mínimo de combined_score (default: {UMBRAL_SCORE})."
+    )
+    parser.add_argument(
+        '--host',
+        default=HOST,
+        help=f"Dirección de escucha (default: {HOST}, solo local)."
+    )
+    parser.add_argument(
+        '--puerto',
+        type=int,
+        default=PUERTO,
+        help=f"Puerto TCP (default: {PUERTO})."
+    )
+    parser.add_argument(
+        '--socket',
+        default=None,
+        help="Ruta de un socket Unix; si se indica, se usa en lugar de TCP."
+    )
+    parser.add_argument(
+        '--sin-indice',
+        action='store_true',
+        help="No carga el índice de métricas globales."
+    )
+    parser.add_argument(
+        '--enrichr-url',
+        default=ENRICHR_URL,
+        help=f"URL base del servidor Enrichr (default: {ENRICHR_URL})."
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=CACHE_DIR,
+        help="Carpeta de la caché en disco de respuestas de Enrichr (usa otra al probar contra un Enrichr local)."
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"[ERROR] Archivo no encontrado: {args.input}")
+        sys.exit(1)
+
+    estado = EstadoServicio(args.input, args.umbral, usar_indice=not args.sin_indice,
+                            enrichr_url=args.enrichr_url, cache_dir=args.cache_dir)
+    servidor = crear_servidor(estado, args.host, args.puerto, args.socket)
+    destino = args.socket or f"http://{args.host}:{args.puerto}"
+    print(f"Escuchando en {destino} (Ctrl+C para detener)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servicio...")
+    finally:
+        servidor.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+# ----------------------------------------------------------------------
+#     SIGNIFICANCIA DE CONECTIVIDAD DEL MÓDULO (LCC Z-SCORE, MUESTREO PARALELO)
+# ----------------------------------------------------------------------
+import os
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from scipy.sparse.csgraph import connected_components
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Parámetros Globales ---
+UMBRAL_SCORE = 700
+N_MUESTRAS = 10000
+# Tamaño mínimo de cada grupo de grado para el muestreo emparejado por grado
+TAMAÑO_MIN_GRUPO = 100
+# Muestras aleatorias por lote (un solo connected_components por lote)
+TAMAÑO_LOTE = 100
+SEMILLA_ALEATORIA = 42
+
+# Estado de cada proceso trabajador (se inicializa una vez por proceso)
+_ESTADO = {}
+
+
+# ----------------------------------------------------------------------
+#                                   FUNCIONES DE LECTURA Y CONVERSIÓN
+# ----------------------------------------------------------------------
+def cargar_genes(file_path):
+    """Carga genes desde un TSV/TXT (primera columna, con o sin cabecera)."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"No se encontró el archivo: {file_path}")
+    df = pd.read_csv(file_path, sep="\t", header=None, usecols=[0], dtype=str)
+    genes = df[0].dropna().str.strip().str.upper()
+    # connected_seed_genes.tsv tiene cabecera; diamond_results.tsv no
+    genes = genes[genes != "HUGO_SYMBOL"]
+    return list(dict.fromkeys(genes))
+
+
+def matriz_adyacencia(network_file, umbral=UMBRAL_SCORE):
+    """Lee la red TSV, filtra por score y devuelve (nodos ordenados, adyacencia CSR simétrica sin pesos)."""
+    df = pd.read_csv(network_file, sep="\t")
+    df = df.iloc[:, [0, 1, 2]]
+    df.columns = ["protein1_hugo", "protein2_hugo", "combined_score"]
+    df["combined_score"] = pd.to_numeric(df["combined_score"], errors="coerce")
+    df = df[df["combined_score"] >= umbral]
+
+    p1 = df["protein1_hugo"].astype(str).str.upper().to_numpy()
+    p2 = df["protein2_hugo"].astype(str).str.upper().to_numpy()
+    codigos, nodos = pd.factorize(np.concatenate([p1, p2]), sort=True)
+    u, v = codigos[:len(p1)], codigos[len(p1):]
+    sin_loops = u != v
+    u, v = u[sin_loops], v[sin_loops]
+
+    n = len(nodos)
+    A = scipy.sparse.csr_matrix(
+        (np.ones(2 * len(u), dtype=np.int8), (np.concatenate([u, v]), np.concatenate([v, u]))), shape=(n, n)
+    )
+    # Colapsar aristas duplicadas a 1
+    A.data[:] = 1
+    A.sum_duplicates()
+    A.data[:] = 1
+    return np.asarray(nodos, dtype=str), A
+
+
+# ----------------------------------------------------------------------
+#                                            FUNCIONES DE LCC Y MUESTREO
+# ----------------------------------------------------------------------
+def tamaño_lcc(A, idx):
+    """Tamaño de la mayor componente conexa del subgrafo inducido por los nodos idx."""
+    if len(idx) == 0:
+        return 0
+    sub = A[idx][:, idx]
+    _, etiquetas = connected_components(sub, directed=False)
+    return int(np.bincount(etiquetas).max())
+
+
+def lcc_por_lotes(A, muestras):
+    """
+    LCC de muchas muestras a la vez: se construye el grafo diagonal por bloques
+    (un bloque por muestra) y se llama una sola vez a connected_components.
+    `muestras` es un array (B, m) de índices de nodo sin repetidos por fila.
+    """
+    B, m = muestras.shape
+    if m == 0:
+        return np.zeros(B, dtype=int)
+    n = A.shape[0]
+    planos = muestras.ravel()
+
+    # Posición local (+1) de cada nodo dentro de su muestra, en un array plano B×n (0 = no pertenece)
+    posicion = np.zeros(B * n, dtype=np.int32)
+    posicion[np.repeat(np.arange(B, dtype=np.int64) * n, m) + planos] = np.tile(np.arange(1, m + 1, dtype=np.int32), B)
+
+    filas_sub = A[planos]
+    longitudes = np.diff(filas_sub.indptr)
+    # Desplazamiento (muestra × n) de cada entrada, para consultar su posición en la misma muestra
+    desplazamiento = np.repeat(np.repeat(np.arange(B, dtype=np.int64) * n, m), longitudes)
+    col_local = posicion[desplazamiento + filas_sub.indices]
+    dentro = np.flatnonzero(col_local)
+    filas = np.repeat(np.arange(B * m, dtype=np.int32), longitudes)[dentro]
+
+    bloque = scipy.sparse.csr_matrix(
+        (np.ones(len(dentro), dtype=np.int8), (filas, (filas // m) * m + col_local[dentro] - 1)),
+        shape=(B * m, B * m)
+    )
+    n_comp, etiquetas = connected_components(bloque, directed=False)
+    tamaños = np.bincount(etiquetas, minlength=n_comp)
+    muestra_comp = np.zeros(n_comp, dtype=np.int64)
+    muestra_comp[etiquetas] = np.arange(B * m) // m
+    lcc = np.zeros(B, dtype=int)
+    np.maximum.at(lcc, muestra_comp, tamaños)
+    return lcc
+
+
+def grupos_por_grado(grados, tamaño_min=TAMAÑO_MIN_GRUPO):
+    """
+    Agrupa los nodos por grado, fusionando grados consecutivos hasta que cada
+    grupo tenga al menos `tamaño_min` nodos. Devuelve (grupo de cada nodo, miembros de cada grupo).
+    """
+    orden = np.argsort(grados, kind="stable")
+    valores, inicios = np.unique(grados[orden], return_index=True)
+    limites = list(inicios[1:]) + [len(orden)]
+
+    grupos, actual, inicio = [], [], 0
+    for fin in limites:
+        actual = orden[inicio:fin] if len(actual) == 0 else np.concatenate([actual, orden[inicio:fin]])
+        inicio = fin
+        if len(actual) >= tamaño_min:
+            grupos.append(actual)
+            actual = []
+    if len(actual):
+        if grupos:
+            grupos[-1] = np.concatenate([grupos[-1], actual])
+        else:
+            grupos.append(actual)
+
+    grupo_de = np.empty(len(grados), dtype=np.int64)
+    for g, miembros in enumerate(grupos):
+        grupo_de[miembros] = g
+    return grupo_de, grupos
+
+
+def muestrear_emparejado(rng, recuento_grupos, grupos, B):
+    """B conjuntos aleatorios con el mismo número de nodos por grupo de grado que el módulo."""
+    partes = []
+    for g, c in recuento_grupos:
+        miembros = grupos[g]
+        # Muestreo sin reemplazo dentro del grupo: los c menores de una permutación aleatoria
+        claves = rng.random((B, len(miembros)))
+        elegidos = np.argpartition(claves, c - 1, axis=1)[:, :c] if c < len(miembros) else np.tile(np.arange(c), (B, 1))
+        partes.append(miembros[elegidos])
+    return np.concatenate(partes, axis=1) if partes else np.zeros((B, 0), dtype=np.int64)
+
+
+def _inicializar_trabajador(A, grupos):
+    _ESTADO['A'] = A
+    _ESTADO['grupos'] = grupos
+
+
+def _lote_aleatorio(args):
+    semilla, recuento_grupos, B = args
+    rng = np.random.default_rng(semilla)
+    muestras = muestrear_emparejado(rng, recuento_grupos, _ESTADO['grupos'], B)
+    return lcc_por_lotes(_ESTADO['A'], muestras)
+
+
+def distribucion_lcc(A, grupo_de, grupos, idx, n_muestras=N_MUESTRAS, procesos=None,
+                     semilla=SEMILLA_ALEATORIA, tamaño_lote=TAMAÑO_LOTE):
+    """LCC de `n_muestras` conjuntos aleatorios emparejados por grado con idx, repartidos en procesos."""
+    recuento = np.bincount(grupo_de[idx], minlength=len(grupos))
+    recuento_grupos = [(g, int(c)) for g, c in enumerate(recuento) if c > 0]
+
+    tamaños_lote = [tamaño_lote] * (n_muestras // tamaño_lote)
+    if n_muestras % tamaño_lote:
+        tamaños_lote.append(n_muestras % tamaño_lote)
+    # Una semilla independiente por lote: el resultado no depende del número de procesos
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamaños_lote))
+    tareas = [(s, recuento_grupos, b) for s, b in zip(semillas, tamaños_lote)]
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1:
+        _inicializar_trabajador(A, grupos)
+        resultados = [_lote_aleatorio(t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                                 initargs=(A, grupos)) as executor:
+            resultados = list(executor.map(_lote_aleatorio, tareas))
+    return np.concatenate(resultados) if resultados else np.zeros(0, dtype=int)
+
+
+def significancia_lcc(nombre, genes, nodos, A, grupo_de, grupos, n_muestras=N_MUESTRAS,
+                      procesos=None, semilla=SEMILLA_ALEATORIA):
+    """Compara la LCC observada del módulo con la de conjuntos aleatorios emparejados por grado."""
+    consulta = np.array([str(g).upper() for g in genes], dtype=str)
+    pos = np.searchsorted(nodos, consulta)
+    pos_segura = np.minimum(pos, len(nodos) - 1)
+    idx = np.unique(pos_segura[(pos < len(nodos)) & (nodos[pos_segura] == consulta)])
+
+    inicio = time.time()
+    observado = tamaño_lcc(A, idx)
+    aleatorio = distribucion_lcc(A, grupo_de, grupos, idx, n_muestras, procesos, semilla)
+    media, sd = float(aleatorio.mean()), float(aleatorio.std())
+    z = (observado - media) / sd if sd > 0 else float('nan')
+    p = (np.sum(aleatorio >= observado) + 1) / (len(aleatorio) + 1)
+    print(f"   {nombre}: LCC = {observado}/{len(idx)} | aleatorio = {media:.1f} ± {sd:.1f} | "
+          f"z = {z:.2f} | p = {p:.2e} ({n_muestras} muestras en {time.time() - inicio:.1f} s)")
+
+    return {
+        'Modulo': nombre,
+        'N_genes': len(genes),
+        'N_en_red': len(idx),
+        'LCC_observado': observado,
+        'LCC_aleatorio_media': media,
+        'LCC_aleatorio_sd': sd,
+        'Z_score': z,
+        'P_empirico': p,
+        'Muestras': n_muestras,
+    }
+
+
+# ----------------------------------------------------------------------
+#                                                         MAIN CLI
+# ----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Significancia de la conectividad (LCC z-score) de las semillas y del módulo expandido con DIAMOnD."
+    )
+    parser.add_argument(
+        '--connected-seeds',
+        required=True,
+        help="Ruta al archivo de genes semilla conectados (connected_seed_genes.tsv)."
+    )
+    parser.add_argument(
+        '--diamond-results',
+        required=True,
+        help="Ruta al archivo de resultados de DIAMOnD (diamond_results.tsv)."
+    )
+    parser.add_argument(
+        '--input',
+        required=True,
+        help="Ruta al archivo de entrada de la red (HUGO/TSV)."
+    )
+    parser.add_argument(
+        '--umbral',
+        type=int,
+        default=UMBRAL_SCORE,
+        help=f"Umbral mínimo de combined_score (default: {UMBRAL_SCORE})."
+    )
+    parser.add_argument(
+        '--muestras',
+        type=int,
+        default=N_MUESTRAS,
+        help=f"Número de conjuntos aleatorios emparejados por grado (default: {N_MUESTRAS})."
+    )
+    parser.add_argument(
+        '--procesos',
+        type=int,
+        default=None,
+        help="Número de procesos para el muestreo (default: todos los núcleos)."
+    )
+    parser.add_argument(
+        '--semilla',
+        type=int,
+        default=SEMILLA_ALEATORIA,
+        help=f"Semilla aleatoria (default: {SEMILLA_ALEATORIA})."
+    )
+    parser.add_argument(
+        '--output',
+        default='significancia_modulo.tsv',
+        help="Nombre del archivo de salida (se guarda junto a connected_seed_genes.tsv)."
+    )
+    args = parser.parse_args()
+
+    try:
+        semillas = cargar_genes(args.connected_seeds)
+        candidatos = cargar_genes(args.diamond_results)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    print(f"\nCargando red {args.input} (score >= {args.umbral})...")
+    nodos, A = matriz_adyacencia(args.input, args.umbral)
+    grados = np.diff(A.indptr)
+    grupo_de, grupos = grupos_por_grado(grados)
+    print(f"Red: {len(nodos)} nodos, {A.nnz // 2} enlaces, {len(grupos)} grupos de grado.")
+
+    print(f"\n--- Significancia de la LCC ({args.muestras} muestras emparejadas por grado) ---")
+    filas = [
+        significancia_lcc("Semillas", semillas, nodos, A, grupo_de, grupos, args.muestras, args.procesos, args.semilla),
+        significancia_lcc("Semillas+Candidatos", list(dict.fromkeys(semillas + candidatos)), nodos, A,
+                          grupo_de, grupos, args.muestras, args.procesos, args.semilla),
+    ]
+
+    output_path = os.path.join(os.path.dirname(os.path.abspath(args.connected_seeds)), args.output)
+    pd.DataFrame(filas).to_csv(output_path, sep="\t", index=False)
+    print(f"\nSignificancia del módulo guardada en: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
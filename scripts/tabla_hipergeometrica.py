@@ -0,0 +1,243 @@
+# ----------------------------------------------------------------------
+#     TABLAS PERSISTENTES DE COLAS HIPERGEOMÉTRICAS (LOG P-VALORES DIAMOnD)
+# ----------------------------------------------------------------------
+import os
+import math
+import threading
+from functools import lru_cache
+import numpy as np
+import scipy.special
+
+# Módulo de biblioteca: la caché se sitúa respecto a este archivo (no a sys.argv[0])
+# para que no dependa de desde dónde se importe
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache_hipergeometrica")
+
+# --- Parámetros Globales ---
+# Grados cubiertos por las tablas en disco; los mayores van a la caché LRU
+K_MAX = 64
+# Número de tamaños de cluster (s) por archivo de tabla
+BLOQUE_S = 64
+# Entradas máximas de la caché LRU para la cola de k grandes
+LRU_MAX = 200000
+
+
+@lru_cache(maxsize=8)
+def log_factoriales(N):
+    """Array de solo lectura con ln n! para n = 0..N."""
+    valores = scipy.special.gammaln(np.arange(N + 1, dtype=np.float64) + 1)
+    valores.flags.writeable = False
+    return valores
+
+
+def log_combinaciones(n, r, log_fact):
+    """ln C(n, r) vectorizado (enteros, por consulta en `log_fact`); -inf fuera de 0 <= r <= n."""
+    n, r = np.broadcast_arrays(np.asarray(n, dtype=np.int64), np.asarray(r, dtype=np.int64))
+    validos = (r >= 0) & (r <= n)
+    r_ok, n_ok = np.where(validos, r, 0), np.where(validos, n, 0)
+    return np.where(validos, log_fact[n_ok] - log_fact[r_ok] - log_fact[n_ok - r_ok], -np.inf)
+
+
+def log_pmf(x, k, N, s):
+    """ln P(X = x) con X ~ Hipergeométrica(N, s, k): x de los k enlaces caen en el cluster."""
+    log_fact = log_factoriales(int(N))
+    return (log_combinaciones(s, x, log_fact) + log_combinaciones(N - s, np.asarray(k) - x, log_fact)
+            - log_combinaciones(N, k, log_fact))
+
+
+def log_primer_termino(kb, k, N, s):
+    """ln P(X = kb) escalar (con math.lgamma): cota inferior de ln P(X >= kb)."""
+    if kb > k or kb > s or k - kb > N - s:
+        return -math.inf
+    return (math.lgamma(s + 1) - math.lgamma(kb + 1) - math.lgamma(s - kb + 1)
+            + math.lgamma(N - s + 1) - math.lgamma(k - kb + 1) - math.lgamma(N - s - k + kb + 1)
+            - math.lgamma(N + 1) + math.lgamma(k + 1) + math.lgamma(N - k + 1))
+
+
+def log_cola(kb, k, N, s):
+    """ln P(X >= kb) para un único (kb, k), sumando en escala logarítmica."""
+    x = np.arange(kb, min(k, s) + 1)
+    if len(x) == 0:
+        return -np.inf
+    return float(scipy.special.logsumexp(log_pmf(x, k, N, s)))
+
+
+def log_colas(kb, k, N, s):
+    """
+    ln P(X >= kb) para arrays de firmas (kb, k, s) de longitud arbitraria: todos
+    los términos de todas las colas se evalúan juntos y se suman por segmentos.
+    """
+    kb, k, s = (np.asarray(v, dtype=np.int64) for v in (kb, k, s))
+    longitudes = np.maximum(np.minimum(k, s) - kb + 1, 0)
+    resultado = np.full(len(kb), -np.inf)
+    validos = np.flatnonzero(longitudes > 0)
+    if len(validos) == 0:
+        return resultado
+
+    longitudes = longitudes[validos]
+    inicios = np.cumsum(longitudes) - longitudes
+    segmento = np.repeat(np.arange(len(validos)), longitudes)
+    x = kb[validos][segmento] + np.arange(len(segmento)) - inicios[segmento]
+    terminos = log_pmf(x, k[validos][segmento], N, s[validos][segmento])
+
+    maximos = np.maximum.reduceat(terminos, inicios)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sumas = np.add.reduceat(np.exp(terminos - maximos[segmento]), inicios)
+        resultado[validos] = np.where(np.isfinite(maximos), maximos + np.log(sumas), -np.inf)
+    return resultado
+
+
+def log_colas_interpoladas(kb, k, N, s, cota=False):
+    """
+    Extensión de ln P(X >= kb) a conteos no enteros (grados y kb ponderados):
+    interpolación bilineal de ln p entre los (k, kb) enteros vecinos, con
+    kb <= min(k, s) en cada esquina. Con conteos enteros coincide con log_colas.
+    Con cota=True se interpola el primer término de la cola (cota inferior).
+    """
+    kb, k = np.asarray(kb, dtype=np.float64), np.asarray(k, dtype=np.float64)
+    s = np.broadcast_to(np.asarray(s, dtype=np.int64), kb.shape)
+    k0, kb0 = np.floor(k), np.floor(kb)
+    tk, tb = k - k0, kb - kb0
+    funcion = (lambda b, c, t: log_pmf(b, c, N, t)) if cota else (lambda b, c, t: log_colas(b, c, N, t))
+
+    # Las cuatro esquinas se evalúan en una sola llamada y se suman ponderadas
+    pesos = np.stack([(1 - tk) * (1 - tb), (1 - tk) * tb, tk * (1 - tb), tk * tb])
+    esquinas_k = np.stack([k0, k0, k0 + 1, k0 + 1])
+    esquinas_kb = np.minimum(np.minimum(np.stack([kb0, kb0 + 1, kb0, kb0 + 1]), esquinas_k), s)
+    usar = pesos > 0
+    valores = funcion(esquinas_kb[usar].astype(np.int64), esquinas_k[usar].astype(np.int64),
+                      np.broadcast_to(s, pesos.shape)[usar])
+    resultado = np.zeros(pesos.shape)
+    resultado[usar] = pesos[usar] * valores
+    return resultado.sum(axis=0)
+
+
+def log_colas_fila(N, s, k_max):
+    """
+    Matriz (k_max + 1) x (k_max + 1) con ln P(X >= kb) para todos los k <= k_max
+    y un mismo s: suma acumulada (en log) de la pmf desde la derecha.
+    """
+    k = np.arange(k_max + 1)[:, None]
+    x = np.arange(k_max + 1)[None, :]
+    with np.errstate(invalid='ignore'):
+        colas = np.logaddexp.accumulate(log_pmf(x, k, N, s)[:, ::-1], axis=1)[:, ::-1]
+    colas[:, 0] = 0.0  # P(X >= 0) = 1
+    return colas
+
+
+class TablaHipergeometrica:
+    """
+    Log p-valores de DIAMOnD para una red de N nodos, indexados por (s, k, kb).
+
+    Para k <= K_MAX se usan tablas .npy en disco abiertas con memmap, una por
+    bloque de BLOQUE_S valores de s, que se crean y rellenan de forma perezosa
+    (una fila s completa de una sola vez, vectorizada). Para k > K_MAX se usa
+    una caché LRU acotada en memoria. Todas las ejecuciones sobre una red con
+    el mismo N comparten los mismos archivos.
+    """
+
+    def __init__(self, N, directorio=CACHE_DIR, k_max=K_MAX, bloque_s=BLOQUE_S, lru_max=LRU_MAX):
+        self.N = int(N)
+        self.directorio = directorio
+        self.k_max = k_max
+        self.bloque_s = bloque_s
+        self._bloques = {}
+        self._memmaps = []
+        self._lock = threading.Lock()
+        self.aciertos_tabla = 0
+        self.filas_calculadas = 0
+        self.consultas_lru = 0
+        N_fijo = self.N
+        self._lru = lru_cache(maxsize=lru_max)(lambda kb, k, s: log_cola(kb, k, N_fijo, s))
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta_bloque(self, b):
+        return os.path.join(self.directorio, f"logcola_N{self.N}_k{self.k_max}_s{b * self.bloque_s}.npy")
+
+    def _bloque(self, b):
+        """Abre (o crea) la tabla del bloque b como memmap; NaN marca las filas sin calcular."""
+        tabla = self._bloques.get(b)
+        if tabla is not None:
+            return tabla
+        with self._lock:
+            tabla = self._bloques.get(b)
+            if tabla is not None:
+                return tabla
+            path = self._ruta_bloque(b)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                nueva = np.lib.format.open_memmap(
+                    tmp_path, mode='w+', dtype=np.float64,
+                    shape=(self.bloque_s, self.k_max + 1, self.k_max + 1)
+                )
+                nueva[:] = np.nan
+                nueva.flush()
+                del nueva
+                os.replace(tmp_path, path)
+            mapa = np.load(path, mmap_mode='r+')
+            self._memmaps.append(mapa)
+            # Vista ndarray sobre el mismo mapa: indexar escalares en np.memmap es mucho más lento
+            tabla = np.asarray(mapa)
+            self._bloques[b] = tabla
+            return tabla
+
+    def _rellenar_fila(self, tabla, fila, s):
+        """Calcula de una vez todos los (k, kb) con k <= K_MAX para un tamaño de cluster s."""
+        tabla[fila] = log_colas_fila(self.N, s, self.k_max)
+        self.filas_calculadas += 1
+
+    def log_pvalue(self, kb, k, s):
+        """ln del p-valor de DIAMOnD para un candidato con k enlaces, kb de ellos al cluster de tamaño s."""
+        if k > self.k_max:
+            self.consultas_lru += 1
+            return self._lru(kb, k, s)
+
+        b, fila = divmod(s, self.bloque_s)
+        tabla = self._bloque(b)
+        valor = tabla[fila, k, kb]
+        if np.isnan(valor):
+            self._rellenar_fila(tabla, fila, s)
+            valor = tabla[fila, k, kb]
+        else:
+            self.aciertos_tabla += 1
+        return float(valor)
+
+    def log_cota(self, kb, k, s):
+        """
+        Cota inferior barata de log_pvalue (primer término de la cola), para
+        podar antes de consultar la LRU cuando k > k_max. No cuenta como consulta.
+        """
+        return log_primer_termino(kb, k, self.N, s)
+
+    def sincronizar(self):
+        """Escribe en disco las filas calculadas."""
+        for mapa in self._memmaps:
+            mapa.flush()
+
+    def estadisticas(self):
+        """Uso de memoria y tasa de aciertos de las tablas y de la caché LRU."""
+        info_lru = self._lru.cache_info()
+        consultas_tabla = self.aciertos_tabla + self.filas_calculadas
+        return {
+            'N': self.N,
+            'bloques_abiertos': len(self._bloques),
+            'bytes_tablas': int(sum(t.nbytes for t in self._bloques.values())),
+            'consultas_tabla': consultas_tabla,
+            'aciertos_tabla': self.aciertos_tabla,
+            'tasa_aciertos_tabla': self.aciertos_tabla / consultas_tabla if consultas_tabla else 0.0,
+            'filas_calculadas': self.filas_calculadas,
+            'consultas_lru': self.consultas_lru,
+            'aciertos_lru': info_lru.hits,
+            'tasa_aciertos_lru': info_lru.hits / self.consultas_lru if self.consultas_lru else 0.0,
+            'entradas_lru': info_lru.currsize,
+            # Estimación: clave (3 enteros) + float + nodo de la lista enlazada
+            'bytes_lru_aprox': info_lru.currsize * 200,
+        }
+
+    def resumen(self):
+        e = self.estadisticas()
+        return (f"Tabla hipergeométrica N={e['N']} (acumulado): {e['bloques_abiertos']} bloques "
+                f"({e['bytes_tablas'] / 1e6:.1f} MB en memmap), aciertos {e['aciertos_tabla']}/{e['consultas_tabla']} "
+                f"({100 * e['tasa_aciertos_tabla']:.1f}%), filas calculadas {e['filas_calculadas']} | "
+                f"LRU: {e['aciertos_lru']}/{e['consultas_lru']} aciertos "
+                f"({100 * e['tasa_aciertos_lru']:.1f}%), {e['entradas_lru']} entradas (~{e['bytes_lru_aprox'] / 1e6:.1f} MB)")